@@ -5,22 +5,121 @@ Contains the UIAgent class that handles file operations and Claude interactions.
 """
 
 import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
 from datetime import datetime
-from typing import Optional, Dict, List
+from pathlib import Path
+from typing import Optional, Dict, Iterator, List, Tuple
 import anthropic
 
 from .config import (
     TARGET_PROJECT_DIR,
     ALLOWED_EXTENSIONS,
     CLAUDE_MODEL,
+    COMPACTION_SUMMARY_MAX_TOKENS,
+    CONTEXT_MAX_FINDINGS,
+    EDIT_MODE,
+    FILE_SHORTLIST_SIZE,
+    FILE_DIRECT_SELECT,
+    FILE_DIRECT_SELECT_MAX,
+    MAX_CONTINUATIONS,
+    MAX_TOTAL_OUTPUT_TOKENS,
+    PROMPT_CACHING,
+    PROMPT_CACHING_BETA,
+    PROPOSAL_CONCURRENCY,
+    SYMBOL_EXCERPTS,
+    SYMBOL_EXCERPT_MIN_TOKENS,
     SYSTEM_PROMPT,
     validate_target_path
 )
 from . import database as db
+from . import audit_queue
+from .diffs import EDIT_BLOCK_FORMAT, EditApplyError, apply_edit_blocks, parse_edit_blocks
+from . import llm_cache
+from . import file_index
+from . import file_ranker
+from . import symbol_index
+from .conversations import ConversationStore, DEFAULT_CONVERSATION
+from .context_packer import ContextBlock, ContextPacker, term_overlap, task_terms
+from . import context_packer
+from .tokens import estimate_tokens
 
 logger = logging.getLogger(__name__)
 
+class TruncatedResponseError(RuntimeError):
+    """A reply still stopped at max_tokens after the allowed continuations."""
+
+
+EDIT_SYSTEM_PROMPT = f"""You are a code assistant. Instead of returning whole files, describe your changes as edit blocks.
+
+{EDIT_BLOCK_FORMAT}
+
+Large files may be shown as excerpts, with omitted regions replaced by a
+"... [lines X-Y omitted: ...] ..." marker. Only quote lines that are shown;
+never include a marker line in a SEARCH section."""
+
+# Explains symbol excerpts in task prompts
+EXCERPT_NOTE = (
+    "Some large files are shown as excerpts: their imports and the code relevant to this task, "
+    "with other regions replaced by \"... [lines X-Y omitted: <signatures>] ...\" markers."
+)
+
+
+def _stage_write(target_file: Path, content: str) -> str:
+    """Write content to a temp file next to target_file and return its path."""
+    fd, tmp_path = tempfile.mkstemp(dir=target_file.parent, prefix=f".{target_file.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        if target_file.exists():
+            os.chmod(tmp_path, target_file.stat().st_mode & 0o777)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path
+
+
+def _backup_file(target_file: Path) -> str:
+    """Copy target_file to a temp file next to it (preserving its mode) and return its path."""
+    fd, backup_path = tempfile.mkstemp(dir=target_file.parent, prefix=f".{target_file.name}.", suffix=".bak")
+    os.close(fd)
+    try:
+        shutil.copy2(target_file, backup_path)
+    except BaseException:
+        os.unlink(backup_path)
+        raise
+    return backup_path
+
+
+def atomic_write_text(target_file: Path, content: str):
+    """Replace target_file's content atomically (temp file + rename)."""
+    os.replace(_stage_write(target_file, content), target_file)
+
+
+def _text_block(text: str, cache: bool = False) -> Dict:
+    """Build a text content block, optionally ending a prompt-cache prefix."""
+    block = {"type": "text", "text": text}
+    if cache and PROMPT_CACHING:
+        block["cache_control"] = {"type": "ephemeral"}
+    return block
+
+
+def _resumed(continuation: str, dropped: str) -> str:
+    """Continuation text minus whitespace re-emitted in place of ``dropped`` (trimmed off the prefill)."""
+    overlap = len(continuation) - len(continuation.lstrip())
+    return continuation[min(overlap, len(dropped)):]
+
+
+def _usage_counts(usage) -> Dict:
+    """Token counts from a response's usage, including prompt-cache reads/writes."""
+    return {
+        field: getattr(usage, field, None) or 0
+        for field in db.USAGE_FIELDS
+    }
+
 
 class UIAgent:
     """Agent that handles file operations and Claude interactions via web interface."""
@@ -28,11 +127,168 @@ class UIAgent:
     def __init__(self, api_key: str, model: str = CLAUDE_MODEL):
         self.client = anthropic.Anthropic(api_key=api_key)
         self.model = model
-        self.conversation_history = []
+        self.conversations = ConversationStore(summarizer=self._summarize_turns)
         self.capabilities = self._get_capabilities()
         self.app_urls = self._get_app_urls()
         logger.info("UIAgent initialized")
 
+    def _request_kwargs(self, system, messages: List[Dict], max_tokens: int) -> Dict:
+        """Keyword arguments shared by messages.create and messages.stream."""
+        kwargs = {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "system": system,
+            "messages": messages
+        }
+        if PROMPT_CACHING:
+            kwargs["extra_headers"] = {"anthropic-beta": PROMPT_CACHING_BETA}
+        return kwargs
+
+    def _cache_lookup(self, purpose: str, system, messages: List[Dict], max_tokens: int, use_cache: bool):
+        """Return (cache key or None, cached reply or None) for a request."""
+        cache = llm_cache.get_cache()
+        if not (use_cache and cache.enabled):
+            cache.note_bypass()
+            return None, None
+        key = llm_cache.cache_key(self.model, system, messages, max_tokens)
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info(f"{purpose}: served from response cache")
+        return key, cached
+
+    def _record_usage(self, purpose: str, response_usage) -> Dict:
+        usage = _usage_counts(response_usage)
+        logger.info(
+            f"{purpose}: {usage['input_tokens']} in / {usage['output_tokens']} out, "
+            f"cache read {usage['cache_read_input_tokens']}, cache write {usage['cache_creation_input_tokens']}"
+        )
+        audit_queue.record_llm_usage(purpose, self.model, usage)
+        return usage
+
+    def _continuation(self, messages: List[Dict], partial: str) -> List[Dict]:
+        """Messages that make Claude resume after ``partial`` (sent as an assistant prefill)."""
+        # The API rejects a prefill ending in whitespace; the reply is joined
+        # onto the unstripped partial (see _resumed)
+        return messages + [{"role": "assistant", "content": partial.rstrip()}]
+
+    def _should_continue(self, purpose: str, stop_reason: str, calls: int, output_tokens: int) -> bool:
+        """Whether a reply that stopped with ``stop_reason`` gets another call."""
+        if stop_reason != "max_tokens":
+            return False
+        if calls <= MAX_CONTINUATIONS and output_tokens < MAX_TOTAL_OUTPUT_TOKENS:
+            logger.info(f"{purpose}: hit max_tokens, continuing ({calls}/{MAX_CONTINUATIONS})")
+            return True
+        return False
+
+    def _complete(
+        self,
+        purpose: str,
+        system,
+        messages: List[Dict],
+        max_tokens: int,
+        use_cache: bool = True,
+        strict: bool = False
+    ) -> str:
+        """Call Claude and return the reply text, recording token usage under ``purpose``.
+
+        ``system`` and message contents may be plain strings or lists of
+        content blocks; blocks built with ``_text_block(..., cache=True)``
+        mark the end of a cacheable prompt prefix. Identical requests are
+        answered from the response cache unless ``use_cache`` is False.
+
+        A reply that stops at ``max_tokens`` is continued from where it left
+        off, up to MAX_CONTINUATIONS more calls / MAX_TOTAL_OUTPUT_TOKENS.
+        If it is still cut off, ``strict`` callers (whose output is applied
+        to files) get TruncatedResponseError; others get the partial text.
+        """
+        key, cached = self._cache_lookup(purpose, system, messages, max_tokens, use_cache)
+        if cached is not None:
+            return cached
+
+        text = ""
+        calls = output_tokens = 0
+        while True:
+            request_messages = self._continuation(messages, text) if text else messages
+            dropped = text[len(text.rstrip()):]
+            response = self.client.messages.create(**self._request_kwargs(system, request_messages, max_tokens))
+            calls += 1
+            output_tokens += self._record_usage(purpose, response.usage)["output_tokens"]
+            text += _resumed(response.content[0].text, dropped)
+            if not self._should_continue(purpose, response.stop_reason, calls, output_tokens):
+                break
+
+        if response.stop_reason == "max_tokens":
+            if strict:
+                raise TruncatedResponseError(
+                    f"{purpose}: reply still truncated after {calls} calls ({output_tokens} output tokens)"
+                )
+            logger.warning(f"{purpose}: reply truncated at max_tokens after {calls} calls")
+        elif key is not None:
+            llm_cache.get_cache().put(key, text, purpose, self.model)
+        return text
+
+    def _stream(self, purpose: str, system, messages: List[Dict], max_tokens: int, use_cache: bool = True) -> Iterator[str]:
+        """Streaming counterpart of _complete: yield reply text deltas as they arrive."""
+        key, cached = self._cache_lookup(purpose, system, messages, max_tokens, use_cache)
+        if cached is not None:
+            yield cached
+            return
+
+        text = ""
+        calls = output_tokens = 0
+        while True:
+            request_messages = self._continuation(messages, text) if text else messages
+            # Whitespace dropped from the prefill was already sent; don't send it twice
+            dropped = text[len(text.rstrip()):]
+            with self.client.messages.stream(**self._request_kwargs(system, request_messages, max_tokens)) as stream:
+                for delta in stream.text_stream:
+                    if dropped:
+                        delta = _resumed(delta, dropped)
+                        dropped = ""
+                    text += delta
+                    if delta:
+                        yield delta
+                final = stream.get_final_message()
+            calls += 1
+            output_tokens += self._record_usage(purpose, final.usage)["output_tokens"]
+            if not self._should_continue(purpose, final.stop_reason, calls, output_tokens):
+                break
+
+        if final.stop_reason == "max_tokens":
+            logger.warning(f"{purpose}: streamed reply truncated at max_tokens after {calls} calls")
+        elif key is not None:
+            llm_cache.get_cache().put(key, text, purpose, self.model)
+
+    def _summarize_turns(self, previous_summary: Optional[str], messages: List[Dict]) -> str:
+        """Fold older conversation turns into a rolling summary (used by history compaction)."""
+        transcript = "\n\n".join(f"{message['role'].upper()}: {message['content']}" for message in messages)
+        earlier = f"Summary so far:\n{previous_summary}\n\n" if previous_summary else ""
+        return self._complete(
+            "summarize",
+            system="You summarize conversations between a user and a code assistant. "
+                   "Keep decisions, file paths, requirements and open questions; drop pleasantries. "
+                   "Return only the summary.",
+            messages=[{"role": "user", "content": f"{earlier}Conversation to fold in:\n\n{transcript}"}],
+            max_tokens=COMPACTION_SUMMARY_MAX_TOKENS
+        )
+
+    def _summary_blocks(self, conversation_key: str) -> List[Dict]:
+        """System blocks carrying the conversation's compacted history, if it has one."""
+        summary = self.conversations.summary(conversation_key)
+        if not summary:
+            return []
+        return [_text_block(f"Summary of the earlier conversation:\n{summary}", cache=True)]
+
+    def _chat_system_prompt(self) -> str:
+        """Static part of the chat system prompt (identical on every message)."""
+        return f"""You are a helpful AI assistant that helps users manage files and content. Be concise and helpful.
+
+{self.capabilities}
+
+{self.app_urls}
+
+If users ask what you can do, refer to these capabilities. If they ask about routes or APIs, use the routes information provided."""
+
     def _get_app_urls(self) -> str:
         """Return application URLs for context."""
         from . import routes_generator
@@ -79,17 +335,22 @@ Available capabilities:
 API endpoints:
 - POST /api/chat - General conversation
 - POST /api/task - Smart task (two-step: identify files, then analyze)
+- POST /api/chat/stream, /api/task/stream - Streamed (Server-Sent Events) variants
 - POST /api/file/read - Read a specific file
 - POST /api/file/modify - Modify a file with instructions
 - GET /api/files - List available files
+- GET /api/files/activity?file= - Tickets and changes that touched a file
 - GET /api/status - Get agent status
+- POST /api/llm-cache/clear - Drop cached model responses
 - GET /api/routes - List all API routes
 - GET/POST /api/users - Manage users (admin, tester, developer)
 - GET/POST /api/projects - Manage projects
 - GET/POST /api/tickets - Manage tickets (bug, feature, task, improvement)
 - GET /api/changes - View change history
+- GET /api/dashboard/summary - Ticket counts, pending changes and AI acceptance rate
 - GET/POST /api/context - AI findings and summaries
 - POST /api/context/export - Export findings to markdown file
+- GET /api/search?q= - Full-text search over tickets, findings and change history
 """
 
     def read_file(self, file_path: str) -> Optional[Dict]:
@@ -157,22 +418,18 @@ API endpoints:
             # Step 2: Send to Claude with instruction
             logger.info(f"Asking Claude to propose changes for: {file_path}")
 
-            prompt = f"""Please modify this file according to the instruction.
+            edit = self._generate_edit(
+                "propose_change",
+                file_path,
+                original_content,
+                instruction,
+                full_system=[_text_block("You are a code assistant. Return only the modified file content, nothing else.")],
+                full_request=f"""Please modify this file according to the instruction.
 Return ONLY the complete modified file content, no explanations or markdown code blocks.
 
-Instruction: {instruction}
-
-Current file content:
-{original_content}"""
-
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                system="You are a code assistant. Return only the modified file content, nothing else.",
-                messages=[{"role": "user", "content": prompt}]
+Instruction: {instruction}"""
             )
-
-            proposed_content = response.content[0].text
+            proposed_content = edit["content"]
 
             # Step 3: Store as proposed change
             change_id = db.create_proposed_change(
@@ -191,13 +448,106 @@ Current file content:
                 "file_path": file_path,
                 "original_content": original_content,
                 "proposed_content": proposed_content,
-                "description": instruction
+                "description": instruction,
+                "edit_mode": edit["mode"]
             }
 
         except Exception as e:
             logger.error(f"Error proposing file change: {e}")
             return {"error": str(e)}
 
+    def _generate_edit(
+        self,
+        purpose: str,
+        file_path: str,
+        content: str,
+        instruction: str,
+        full_system,
+        full_request: str,
+        conversation_key: Optional[str] = None
+    ) -> Dict:
+        """
+        Ask Claude to modify a file; returns {"content", "reply", "mode"}.
+
+        In "blocks" mode the reply is SEARCH/REPLACE blocks applied to the
+        original, so output is proportional to the change. If they don't
+        apply, or in "full" mode, Claude returns the whole file (prompted
+        with ``full_system`` / ``full_request``).
+        """
+        history = self.conversations.history(conversation_key) if conversation_key else []
+        summary = self._summary_blocks(conversation_key) if conversation_key else []
+        # File body first so requests against the same file share a cached prefix
+        file_block = _text_block(f"Current file content ({file_path}):\n{content}", cache=True)
+
+        if EDIT_MODE == "blocks":
+            # Edit blocks quote the original verbatim, so an excerpt of a large file is enough
+            excerpt = self._symbol_excerpt(file_path, content, instruction)
+            shown_block = file_block if excerpt is None else _text_block(
+                f"Relevant parts of {file_path}:\n{excerpt}", cache=True
+            )
+            reply = self._complete(
+                f"{purpose}_blocks",
+                system=[_text_block(EDIT_SYSTEM_PROMPT, cache=True)] + summary,
+                messages=history + [{"role": "user", "content": [
+                    shown_block,
+                    _text_block(f"Instruction: {instruction}")
+                ]}],
+                max_tokens=4096,
+                strict=True
+            )
+            try:
+                return {
+                    "content": apply_edit_blocks(content, parse_edit_blocks(reply)),
+                    "reply": reply,
+                    "mode": "blocks"
+                }
+            except EditApplyError as e:
+                logger.warning(f"Edit blocks for {file_path} did not apply ({e}); requesting the full file")
+
+        reply = self._complete(
+            purpose,
+            system=full_system + summary,
+            messages=history + [{"role": "user", "content": [file_block, _text_block(full_request)]}],
+            max_tokens=4096,
+            strict=True
+        )
+        return {"content": reply, "reply": reply, "mode": "full"}
+
+    def _symbol_excerpt(self, file_path: str, content: str, task: str) -> Optional[str]:
+        """The task-relevant symbols of a large file, or None to send it whole."""
+        if not SYMBOL_EXCERPTS or estimate_tokens(content) < SYMBOL_EXCERPT_MIN_TOKENS:
+            return None
+        try:
+            return symbol_index.get_index().excerpt(file_path, content, task)
+        except Exception as e:
+            logger.warning(f"Could not excerpt {file_path}: {e}")
+            return None
+
+    def propose_file_changes(self, items: List[Tuple[str, str]], ticket_id: int = None) -> List[Dict]:
+        """Propose changes for several (file_path, instruction) pairs concurrently.
+
+        At most PROPOSAL_CONCURRENCY calls run at once; each proposal is stored
+        as soon as its call finishes. Results come back in input order.
+        """
+        if not items:
+            return []
+
+        results: List[Optional[Dict]] = [None] * len(items)
+        with ThreadPoolExecutor(max_workers=max(1, min(PROPOSAL_CONCURRENCY, len(items))),
+                                thread_name_prefix="propose") as pool:
+            futures = {
+                pool.submit(self.propose_file_change, file_path, instruction, ticket_id): index
+                for index, (file_path, instruction) in enumerate(items)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    logger.error(f"Error proposing change for {items[index][0]}: {e}")
+                    results[index] = {"error": str(e)}
+        return results
+
     def apply_proposed_change(self, change_id: int) -> Optional[Dict]:
         """Apply a previously proposed change."""
         try:
@@ -214,13 +564,13 @@ Current file content:
             if not validate_target_path(target_file):
                 return {"error": "Safety check failed on write"}
 
-            target_file.write_text(change['proposed_content'], encoding='utf-8')
+            atomic_write_text(target_file, change['proposed_content'])
 
             # Update status
             db.update_proposed_change_status(change_id, 'accepted')
 
-            # Record in changes history
-            db.record_change(
+            # Record in changes history (written behind the request)
+            audit_queue.record_change(
                 project_id=None,
                 files_affected=[change['file_path']],
                 change_type="modify",
@@ -241,6 +591,71 @@ Current file content:
             logger.error(f"Error applying proposed change: {e}")
             return {"error": str(e)}
 
+    def apply_ticket_changes(self, ticket_id: int, project_id: int = None) -> Dict:
+        """
+        Apply all pending proposed changes for a ticket in one pass.
+
+        Every file is staged to a temp file first. The pending changes are
+        read, marked accepted (with their history rows and the ticket
+        resolution) inside one write transaction; the staged files are only
+        renamed into place once those writes succeed, each original kept
+        as a backup. If a rename or the commit fails, every file already
+        replaced is restored and the transaction rolls back, so disk and
+        database never disagree.
+        """
+        staged = []
+        replaced = []  # (target file, backup of its original)
+        try:
+            with db.transaction():
+                changes = db.get_pending_changes_for_ticket(ticket_id)
+
+                # Stage every write before touching any target file
+                errors = []
+                for change in changes:
+                    target_file = TARGET_PROJECT_DIR / change['file_path']
+                    if not validate_target_path(target_file):
+                        errors.append({"file_path": change['file_path'], "error": "Safety check failed on write"})
+                        continue
+                    try:
+                        staged.append((change, target_file, _stage_write(target_file, change['proposed_content'])))
+                    except OSError as e:
+                        errors.append({"file_path": change['file_path'], "error": str(e)})
+
+                applied = [change for change, _, _ in staged]
+                if not applied or not db.accept_proposed_changes(ticket_id, applied, project_id):
+                    logger.info(f"No pending changes to apply for ticket #{ticket_id}")
+                    return {"status": "nothing_to_apply", "applied_changes": [], "errors": errors}
+
+                for change, target_file, tmp_path in staged:
+                    backup_path = _backup_file(target_file)
+                    replaced.append((target_file, backup_path))
+                    os.replace(tmp_path, target_file)
+            logger.info(f"Applied {len(applied)} proposed changes for ticket #{ticket_id}")
+
+            return {
+                "status": "applied",
+                "applied_changes": [change['file_path'] for change in applied],
+                "errors": errors
+            }
+
+        except Exception as e:
+            for target_file, backup_path in reversed(replaced):
+                try:
+                    os.replace(backup_path, target_file)
+                except OSError as restore_error:
+                    logger.error(f"Could not restore {target_file} from {backup_path}: {restore_error}")
+            replaced = []
+            logger.error(f"Error applying changes for ticket #{ticket_id}: {e}")
+            return {"error": str(e)}
+
+        finally:
+            for _, _, tmp_path in staged:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+            for _, backup_path in replaced:
+                if os.path.exists(backup_path):
+                    os.unlink(backup_path)
+
     def reject_proposed_change(self, change_id: int) -> Optional[Dict]:
         """Reject a proposed change."""
         try:
@@ -263,7 +678,9 @@ Current file content:
             logger.error(f"Error rejecting proposed change: {e}")
             return {"error": str(e)}
 
-    def modify_file_with_claude(self, file_path: str, instruction: str) -> Optional[Dict]:
+    def modify_file_with_claude(
+        self, file_path: str, instruction: str, conversation_key: str = DEFAULT_CONVERSATION
+    ) -> Optional[Dict]:
         """Read file, send to Claude with instruction, and write back result."""
         try:
             # Step 1: Read the file
@@ -276,23 +693,21 @@ Current file content:
             # Step 2: Send to Claude with instruction
             logger.info(f"Sending file to Claude with instruction: {instruction[:50]}...")
 
-            self.conversation_history.append({
-                "role": "user",
-                "content": f"Please perform the following operation on this content:\n\n{instruction}\n\nContent:\n\n{content}"
-            })
-
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                system=SYSTEM_PROMPT,
-                messages=self.conversation_history
+            edit = self._generate_edit(
+                "modify_file",
+                file_path,
+                content,
+                instruction,
+                full_system=[_text_block(SYSTEM_PROMPT, cache=True)],
+                full_request=f"Please perform the following operation on this content:\n\n{instruction}",
+                conversation_key=conversation_key
+            )
+            modified_content = edit["content"]
+            self.conversations.append_turn(
+                conversation_key,
+                f"Current file content ({file_path}):\n{content}\n\nInstruction: {instruction}",
+                edit["reply"]
             )
-
-            modified_content = response.content[0].text
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": modified_content
-            })
 
             # Step 3: Write back to file
             target_file = TARGET_PROJECT_DIR / file_path
@@ -301,11 +716,11 @@ Current file content:
             if not validate_target_path(target_file):
                 return {"error": "Safety check failed on write"}
 
-            target_file.write_text(modified_content, encoding='utf-8')
+            atomic_write_text(target_file, modified_content)
             logger.info(f"File modified and saved: {file_path}")
 
-            # Record change in database
-            db.record_change(
+            # Record change in database (written behind the request)
+            audit_queue.record_change(
                 project_id=None,
                 files_affected=[file_path],
                 change_type="modify",
@@ -318,6 +733,7 @@ Current file content:
                 "path": file_path,
                 "original_size": len(content),
                 "modified_size": len(modified_content),
+                "edit_mode": edit["mode"],
                 "preview": modified_content[:500] + "..." if len(modified_content) > 500 else modified_content
             }
 
@@ -325,41 +741,28 @@ Current file content:
             logger.error(f"Error modifying file: {e}")
             return {"error": str(e)}
 
-    def chat(self, user_message: str, app=None) -> str:
-        """Send a message to Claude and get a response."""
-        try:
-            self.conversation_history.append({
-                "role": "user",
-                "content": user_message
-            })
-
-            # Include routes context if question seems related
-            routes_context = ""
-            route_keywords = ['route', 'endpoint', 'api', 'url', 'path', 'navigate']
-            if any(kw in user_message.lower() for kw in route_keywords):
-                routes_context = f"\n\nTarget Project Routes:\n{self.get_target_routes_context(app)}"
+    def _chat_system(self, user_message: str, app=None, conversation_key: str = DEFAULT_CONVERSATION) -> List[Dict]:
+        """System blocks for a chat turn: static prompt first (cached), extras after."""
+        system = [_text_block(self._chat_system_prompt(), cache=True)]
+        system += self._summary_blocks(conversation_key)
 
-            system_with_capabilities = f"""You are a helpful AI assistant that helps users manage files and content. Be concise and helpful.
+        # Include routes context if question seems related
+        route_keywords = ['route', 'endpoint', 'api', 'url', 'path', 'navigate']
+        if any(kw in user_message.lower() for kw in route_keywords):
+            system.append(_text_block(f"Target Project Routes:\n{self.get_target_routes_context(app)}"))
+        return system
 
-{self.capabilities}
-
-{self.app_urls}
-{routes_context}
-
-If users ask what you can do, refer to these capabilities. If they ask about routes or APIs, use the routes information provided."""
-
-            response = self.client.messages.create(
-                model=self.model,
+    def chat(self, user_message: str, app=None, conversation_key: str = DEFAULT_CONVERSATION) -> str:
+        """Send a message to Claude and get a response."""
+        try:
+            assistant_message = self._complete(
+                "chat",
+                system=self._chat_system(user_message, app, conversation_key),
+                messages=self.conversations.history(conversation_key) + [{"role": "user", "content": user_message}],
                 max_tokens=2048,
-                system=system_with_capabilities,
-                messages=self.conversation_history
+                use_cache=False
             )
-
-            assistant_message = response.content[0].text
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": assistant_message
-            })
+            self.conversations.append_turn(conversation_key, user_message, assistant_message)
 
             logger.info("Chat response generated")
             return assistant_message
@@ -368,9 +771,37 @@ If users ask what you can do, refer to these capabilities. If they ask about rou
             logger.error(f"Error in chat: {e}")
             return f"Error: {str(e)}"
 
-    def clear_history(self):
-        """Clear conversation history."""
-        self.conversation_history = []
+    def chat_stream(
+        self, user_message: str, app=None, conversation_key: str = DEFAULT_CONVERSATION
+    ) -> Iterator[Dict]:
+        """Stream a chat reply as events: {"type": "delta", "text"} ..., then "done" or "error".
+
+        The exchange is added to the history only once the reply is complete.
+        """
+        try:
+            parts = []
+            for text in self._stream(
+                "chat",
+                system=self._chat_system(user_message, app, conversation_key),
+                messages=self.conversations.history(conversation_key) + [{"role": "user", "content": user_message}],
+                max_tokens=2048,
+                use_cache=False
+            ):
+                parts.append(text)
+                yield {"type": "delta", "text": text}
+
+            assistant_message = "".join(parts)
+            self.conversations.append_turn(conversation_key, user_message, assistant_message)
+            logger.info("Chat response streamed")
+            yield {"type": "done", "response": assistant_message}
+
+        except Exception as e:
+            logger.error(f"Error in chat stream: {e}")
+            yield {"type": "error", "error": str(e)}
+
+    def clear_history(self, conversation_key: str = DEFAULT_CONVERSATION):
+        """Clear one conversation's history."""
+        self.conversations.clear(conversation_key)
         logger.info("Conversation history cleared")
 
     def save_finding(self, content: str, title: str = None, context_type: str = "finding", tags: List[str] = None) -> int:
@@ -508,28 +939,12 @@ If users ask what you can do, refer to these capabilities. If they ask about rou
         return context
 
     def get_all_files_recursive(self, directory: str = ".") -> List[Dict]:
-        """Recursively get all files in target directory."""
-        files = []
+        """Recursively get all files in target directory (from the incremental file index)."""
         try:
-            target_dir = TARGET_PROJECT_DIR / directory
-            if not target_dir.exists():
-                return files
-
-            for item in target_dir.rglob("*"):
-                if item.is_file() and item.suffix in ALLOWED_EXTENSIONS:
-                    rel_path = str(item.relative_to(TARGET_PROJECT_DIR))
-                    # Skip hidden files and common non-essential directories
-                    if not any(part.startswith('.') for part in rel_path.split('/')):
-                        if not any(skip in rel_path for skip in ['node_modules', '__pycache__', 'venv', '.git']):
-                            files.append({
-                                "path": rel_path,
-                                "name": item.name,
-                                "size": item.stat().st_size
-                            })
-            return files
+            return file_index.get_index().files(directory)
         except Exception as e:
             logger.error(f"Error scanning files: {e}")
-            return files
+            return []
 
     def identify_relevant_files(self, task: str) -> List[str]:
         """Step 1: Ask Claude which files are relevant for the task."""
@@ -542,26 +957,42 @@ If users ask what you can do, refer to these capabilities. If they ask about rou
             if not all_files:
                 return []
 
-            file_list = "\n".join([f"- {f['path']} ({f['size']} bytes)" for f in all_files])
-
+            # Large projects: shortlist candidates locally before asking Claude
+            candidates = all_files
+            if len(all_files) > FILE_SHORTLIST_SIZE:
+                ranker = file_ranker.get_ranker()
+                ranker.refresh(all_files)
+                ranked = ranker.rank(task, FILE_SHORTLIST_SIZE)
+                if FILE_DIRECT_SELECT:
+                    selected = ranker.confident_selection(task, ranked, FILE_DIRECT_SELECT_MAX)
+                    if selected:
+                        logger.info(f"Selected {len(selected)} files locally (clear BM25 ranking): {selected}")
+                        return selected
+                if ranked:
+                    shortlisted = {path for path, _ in ranked}
+                    candidates = [f for f in all_files if f['path'] in shortlisted]
+                    logger.info(f"Shortlisted {len(candidates)} of {len(all_files)} files for task")
+
+            file_list = "\n".join([f"- {f['path']} ({f['size']} bytes)" for f in candidates])
+
+            # File list first (cached across tasks when not shortlisted), the task itself last
             prompt = f"""Given this task: "{task}"
 
-Here are the available files in the project:
-{file_list}
-
 Which files are most relevant to complete this task? Return ONLY a JSON array of file paths, nothing else.
 Example: ["src/index.js", "config.json"]
 
 Be selective - only include files that are directly relevant to the task."""
 
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=1024,
+            result = self._complete(
+                "identify_files",
                 system="You are a helpful assistant that identifies relevant files for a task. Return only valid JSON arrays.",
-                messages=[{"role": "user", "content": prompt}]
-            )
-
-            result = response.content[0].text.strip()
+                messages=[{"role": "user", "content": [
+                    _text_block(f"Here are the available files in the project:\n{file_list}",
+                                cache=candidates is all_files),
+                    _text_block(prompt)
+                ]}],
+                max_tokens=1024
+            ).strip()
             # Parse JSON array from response
             json_match = re.search(r'\[.*?\]', result, re.DOTALL)
             if json_match:
@@ -574,88 +1005,220 @@ Be selective - only include files that are directly relevant to the task."""
             logger.error(f"Error identifying relevant files: {e}")
             return []
 
-    def process_task_two_step(self, task: str, project_id: int = None) -> Dict:
-        """Two-step approach: identify relevant files, then process only those."""
-        try:
-            # Step 0: Fetch API blueprint for context
-            logger.info("Step 0: Fetching target project API blueprint...")
-            api_context = self.get_target_api_context(project_id)
-
-            # Step 1: Identify relevant files
-            logger.info(f"Step 1: Identifying relevant files for task: {task[:50]}...")
-            relevant_files = self.identify_relevant_files(task)
-
-            if not relevant_files:
-                return {"error": "No relevant files found for this task"}
+    def _prepare_task(self, task: str, project_id: int = None, conversation_key: str = DEFAULT_CONVERSATION) -> Dict:
+        """Steps 0-2 of the two-step process: blueprint, relevant files, and the request."""
+        # Step 0: Fetch API blueprint for context
+        logger.info("Step 0: Fetching target project API blueprint...")
+        api_context = self.get_target_api_context(project_id)
 
-            # Step 2: Read only the relevant files
-            logger.info(f"Step 2: Reading {len(relevant_files)} relevant files...")
-            file_contents = {}
-            total_size = 0
+        # Step 1: Identify relevant files
+        logger.info(f"Step 1: Identifying relevant files for task: {task[:50]}...")
+        relevant_files = self.identify_relevant_files(task)
 
-            for file_path in relevant_files:
-                file_data = self.read_file(file_path)
-                if "error" not in file_data:
-                    file_contents[file_path] = file_data["content"]
-                    total_size += len(file_data["content"])
+        if not relevant_files:
+            return {"error": "No relevant files found for this task"}
 
-            if not file_contents:
-                return {"error": "Could not read any of the relevant files"}
+        # Step 2: Read only the relevant files
+        logger.info(f"Step 2: Reading {len(relevant_files)} relevant files...")
+        file_contents = {}
+        total_size = 0
+        excerpted = []
 
-            # Step 3: Send focused content to Claude with API context
-            logger.info(f"Step 3: Sending {len(file_contents)} files ({total_size} chars) to Claude...")
+        for file_path in relevant_files:
+            file_data = self.read_file(file_path)
+            if "error" not in file_data:
+                content = file_data["content"]
+                total_size += len(content)
+                # Large source files: only the symbols the task is about
+                excerpt = self._symbol_excerpt(file_path, content, task)
+                if excerpt is not None:
+                    excerpted.append({"name": file_path, "tokens": estimate_tokens(content),
+                                      "kept_tokens": estimate_tokens(excerpt)})
+                    content = excerpt
+                file_contents[file_path] = content
+
+        if not file_contents:
+            return {"error": "Could not read any of the relevant files"}
+
+        # Pack files, blueprint, prior findings and history into the token budget
+        history = self.conversations.history(conversation_key)
+        turns = [history[i:i + 2] for i in range(0, len(history) - 1, 2)]
+        summary_blocks = self._summary_blocks(conversation_key)
+        task_text = f"Task: {task}"
+        reserved = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(task_text) + sum(
+            estimate_tokens(block["text"]) for block in summary_blocks
+        )
+        packed = ContextPacker().pack(
+            self._task_context_blocks(task, api_context, file_contents, turns, project_id),
+            reserved_tokens=reserved
+        )
+        if packed["truncated"] or packed["dropped"]:
+            logger.info(
+                f"Context packed to {packed['used_tokens']}/{packed['budget']} tokens; "
+                f"truncated {[b['name'] for b in packed['truncated']]}, dropped {[b['name'] for b in packed['dropped']]}"
+            )
 
-            content_block = "\n\n".join([
-                f"=== {path} ===\n{content}"
-                for path, content in file_contents.items()
-            ])
+        files = context_packer.kept(packed, "file")
+        if not files:
+            return {"error": "None of the relevant files fit in the context budget"}
+
+        content_block = "\n\n".join([f"=== {block.name} ===\n{block.text}" for block in files])
+        dropped_files = [b["name"] for b in packed["dropped"] if b["kind"] == "file"]
+        if dropped_files:
+            task_text += f"\n\n(Omitted to fit the context budget: {', '.join(dropped_files)})"
+        if any(entry["name"] in [block.name for block in files] for entry in excerpted):
+            task_text += f"\n\n({EXCERPT_NOTE})"
+
+        # Keep the newest run of history turns that made it into the budget
+        kept_turns = {id(block.data) for block in context_packer.kept(packed, "history")}
+        recent = []
+        for turn in reversed(turns):
+            if id(turn) not in kept_turns:
+                break
+            recent = turn + recent
+
+        # Stable prefix first: system prompt + API blueprint (cached; the
+        # breakpoint goes on the system prompt when the blueprint was dropped),
+        # then the file bodies (cached), then findings and the task text that vary per call
+        blueprint = context_packer.first_kept(packed, "blueprint")
+        system = [_text_block(SYSTEM_PROMPT, cache=blueprint is None)]
+        if blueprint:
+            system.append(_text_block(blueprint.text, cache=True))
+        system += summary_blocks
+
+        files_text = f"Relevant files:\n\n{content_block}"
+        user_blocks = [_text_block(files_text, cache=True)]
+        findings = context_packer.kept(packed, "finding")
+        if findings:
+            user_blocks.append(_text_block("Prior findings:\n\n" + "\n\n".join(
+                f"--- {block.name} ---\n{block.text}" for block in findings
+            )))
+        user_blocks.append(_text_block(task_text))
+
+        return {
+            "task": task,
+            "conversation_key": conversation_key,
+            "files": [block.name for block in files],
+            "total_chars": total_size,
+            "context": dict(context_packer.report(packed), excerpted=excerpted),
+            "user_text": f"{files_text}\n\n{task_text}",
+            "system": system,
+            "messages": recent + [{"role": "user", "content": user_blocks}]
+        }
+
+    def _task_context_blocks(
+        self, task: str, api_context: str, file_contents: Dict[str, str], turns: List[List[Dict]], project_id: int = None
+    ) -> List[ContextBlock]:
+        """Candidate prompt blocks for a task, scored by relevance to it."""
+        terms = task_terms(task)
+        blocks = []
+
+        # Files: Claude's selection order, nudged by term overlap with the task
+        for rank, (path, content) in enumerate(file_contents.items()):
+            relevance = 1.0 / (rank + 1) + term_overlap(terms, f"{path}\n{content}")
+            blocks.append(ContextBlock("file", path, content, relevance))
+
+        blocks.append(ContextBlock("blueprint", "API blueprint", api_context, term_overlap(terms, api_context)))
+
+        # History turns (user + assistant pairs): newer turns rank higher
+        for age, turn in enumerate(reversed(turns)):
+            text = "\n".join(message["content"] for message in turn)
+            blocks.append(ContextBlock("history", f"turn -{age + 1}", text, 1.0 / (age + 1),
+                                       truncatable=False, data=turn))
+
+        # Prior findings ranked by full-text relevance
+        if db.FTS_AVAILABLE:
+            try:
+                hits = db.search(task, types=["context"], project_id=project_id, limit=CONTEXT_MAX_FINDINGS)
+                for rank, entry in enumerate(db.get_ai_context_entries([hit["id"] for hit in hits])):
+                    blocks.append(ContextBlock("finding", entry.get("title") or f"Finding #{entry['id']}",
+                                               entry["content"], 1.0 / (rank + 1)))
+            except Exception as e:
+                logger.warning(f"Could not load prior findings: {e}")
+
+        return blocks
+
+    def _finish_task(self, prepared: Dict, assistant_response: str) -> Dict:
+        """Record a completed task response in history and the audit tables."""
+        task = prepared["task"]
+
+        # History keeps plain text; cache markers only apply to the newest turn
+        self.conversations.append_turn(prepared["conversation_key"], prepared["user_text"], assistant_response)
+
+        # Record the analysis in database (written behind the request)
+        audit_queue.record_change(
+            project_id=None,
+            files_affected=prepared["files"],
+            change_type="analyze",
+            change_summary=task[:200],
+            ai_response=assistant_response[:1000]
+        )
 
-            # Include API blueprint in the prompt
-            full_context = f"Task: {task}\n\n{api_context}\n\nRelevant files:\n\n{content_block}"
+        # Auto-save as finding if it looks like important analysis
+        audit_queue.save_ai_context(
+            content=assistant_response,
+            context_type="finding",
+            title=f"Analysis: {task[:50]}...",
+            tags=["auto-generated", "task-analysis"]
+        )
 
-            self.conversation_history.append({
-                "role": "user",
-                "content": full_context
-            })
+        return {
+            "status": "success",
+            "files_analyzed": prepared["files"],
+            "total_files": len(prepared["files"]),
+            "total_chars": prepared["total_chars"],
+            "context": prepared["context"],
+            "response": assistant_response
+        }
+
+    def process_task_two_step(
+        self, task: str, project_id: int = None, conversation_key: str = DEFAULT_CONVERSATION
+    ) -> Dict:
+        """Two-step approach: identify relevant files, then process only those."""
+        try:
+            prepared = self._prepare_task(task, project_id, conversation_key)
+            if "error" in prepared:
+                return prepared
 
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                system=SYSTEM_PROMPT,
-                messages=self.conversation_history
+            # Step 3: Send focused content to Claude with API context
+            logger.info(f"Step 3: Sending {len(prepared['files'])} files ({prepared['total_chars']} chars) to Claude...")
+            assistant_response = self._complete(
+                "task",
+                system=prepared["system"],
+                messages=prepared["messages"],
+                max_tokens=4096
             )
+            return self._finish_task(prepared, assistant_response)
 
-            assistant_response = response.content[0].text
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": assistant_response
-            })
+        except Exception as e:
+            logger.error(f"Error in two-step process: {e}")
+            return {"error": str(e)}
 
-            # Record the analysis in database
-            db.record_change(
-                project_id=None,
-                files_affected=list(file_contents.keys()),
-                change_type="analyze",
-                change_summary=task[:200],
-                ai_response=assistant_response[:1000]
-            )
+    def task_stream(
+        self, task: str, project_id: int = None, conversation_key: str = DEFAULT_CONVERSATION
+    ) -> Iterator[Dict]:
+        """Stream a two-step task: a "files" event, text deltas, then "done" or "error"."""
+        try:
+            prepared = self._prepare_task(task, project_id, conversation_key)
+            if "error" in prepared:
+                yield {"type": "error", "error": prepared["error"]}
+                return
+
+            yield {
+                "type": "files",
+                "files": prepared["files"],
+                "total_chars": prepared["total_chars"],
+                "context": prepared["context"]
+            }
 
-            # Auto-save as finding if it looks like important analysis
-            db.save_ai_context(
-                content=assistant_response,
-                context_type="finding",
-                title=f"Analysis: {task[:50]}...",
-                tags=["auto-generated", "task-analysis"]
-            )
+            logger.info(f"Step 3: Streaming {len(prepared['files'])} files ({prepared['total_chars']} chars) to Claude...")
+            parts = []
+            for text in self._stream("task", system=prepared["system"], messages=prepared["messages"], max_tokens=4096):
+                parts.append(text)
+                yield {"type": "delta", "text": text}
 
-            return {
-                "status": "success",
-                "files_analyzed": list(file_contents.keys()),
-                "total_files": len(file_contents),
-                "total_chars": total_size,
-                "response": assistant_response
-            }
+            yield {"type": "done", **self._finish_task(prepared, "".join(parts))}
 
         except Exception as e:
-            logger.error(f"Error in two-step process: {e}")
-            return {"error": str(e)}
+            logger.error(f"Error in streamed two-step process: {e}")
+            yield {"type": "error", "error": str(e)}
@@ -15,6 +15,7 @@ from .config import DEMO_DIR, TARGET_PROJECT_DIR, ALLOWED_EXTENSIONS, CLAUDE_API
 from .agent import UIAgent
 from .routes import api
 from . import database as db
+from . import file_watcher
 
 # =============================================================================
 # LOGGING SETUP
@@ -54,10 +55,16 @@ def create_app():
     # Initialize database
     db.init_database()
 
+    # Log any hot list query that has fallen back to a full scan
+    db.audit_query_plans()
+
     # Seed default users and project
     db.seed_default_users()
     db.seed_default_project()
 
+    # Keep the target project's file index current in the background
+    file_watcher.start()
+
     # Initialize agent
     agent = UIAgent(CLAUDE_API_KEY)
     app.config['AGENT'] = agent
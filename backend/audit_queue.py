@@ -0,0 +1,196 @@
+"""
+Write-behind queue for audit records.
+
+Change history and AI context rows are bookkeeping: the request that
+produces them does not need to wait for their fsync. Callers enqueue
+rows here; a background writer thread groups them into batched
+transactions (one executemany per table) and flushes on shutdown.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from . import database as db
+from .config import AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Record kind -> bulk insert function
+WRITERS = {
+    "change": db.record_changes,
+    "ai_context": db.save_ai_contexts,
+    "llm_usage": db.record_llm_usage,
+}
+
+
+class AuditWriter:
+    """Background thread that drains queued audit rows in batches."""
+
+    def __init__(self, batch_size: int = AUDIT_BATCH_SIZE, flush_interval: float = AUDIT_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()  # orders enqueue against close
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self.rows_written = 0
+        self.batches_written = 0
+        self._thread.start()
+
+    def enqueue(self, kind: str, row: Dict):
+        """Queue one row for the given record kind (a key of WRITERS)."""
+        if kind not in WRITERS:
+            raise ValueError(f"Unknown audit record kind: {kind}")
+        with self._lock:
+            if not self._stopping.is_set():
+                self._queue.put((kind, row))
+                return
+        # Writer is gone; don't lose the row
+        WRITERS[kind]([row])
+
+    def depth(self) -> int:
+        """Number of rows waiting to be written."""
+        return self._queue.qsize()
+
+    def flush(self):
+        """Block until every row queued so far has been written."""
+        self._queue.join()
+
+    def close(self):
+        """Stop the writer thread, then write whatever is still queued."""
+        with self._lock:
+            if self._stopping.is_set():
+                return
+            self._stopping.set()
+        self._thread.join(timeout=5)
+
+        # Nothing is enqueued after the stop flag, so this drains the rest
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                break
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _next_batch(self) -> List:
+        """Wait for one row, then gather more for up to flush_interval."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List):
+        by_kind: Dict[str, List[Dict]] = {}
+        for kind, row in batch:
+            by_kind.setdefault(kind, []).append(row)
+
+        for kind, rows in by_kind.items():
+            try:
+                WRITERS[kind](rows)
+                self.rows_written += len(rows)
+                self.batches_written += 1
+            except Exception as e:
+                logger.error(f"Audit writer failed to store {len(rows)} {kind} rows: {e}")
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+_writer: Optional[AuditWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> AuditWriter:
+    """Return the process-wide audit writer, starting it on first use."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditWriter()
+                atexit.register(_writer.close)
+    return _writer
+
+
+def record_change(
+    project_id: Optional[int],
+    files_affected: List[str],
+    change_type: str,
+    change_summary: str,
+    ai_response: Optional[str] = None,
+    ticket_id: Optional[int] = None,
+    user_id: Optional[int] = None
+):
+    """Queue a change history row (see database.record_change)."""
+    get_writer().enqueue("change", {
+        "project_id": project_id,
+        "files_affected": files_affected,
+        "change_type": change_type,
+        "change_summary": change_summary,
+        "ai_response": ai_response,
+        "ticket_id": ticket_id,
+        "user_id": user_id
+    })
+
+
+def save_ai_context(
+    content: str,
+    context_type: str = "finding",
+    title: Optional[str] = None,
+    project_id: Optional[int] = None,
+    tags: Optional[List[str]] = None
+):
+    """Queue an AI context row (see database.save_ai_context)."""
+    get_writer().enqueue("ai_context", {
+        "content": content,
+        "context_type": context_type,
+        "title": title,
+        "project_id": project_id,
+        "tags": tags
+    })
+
+
+def record_llm_usage(purpose: str, model: Optional[str], usage: Dict):
+    """Queue a token usage row (see database.record_llm_usage)."""
+    get_writer().enqueue("llm_usage", {"purpose": purpose, "model": model, **usage})
+
+
+def stats() -> Dict:
+    """Queue depth and throughput counters for the status endpoint."""
+    if _writer is None:
+        return {"queue_depth": 0, "rows_written": 0, "batches_written": 0}
+    return {
+        "queue_depth": _writer.depth(),
+        "rows_written": _writer.rows_written,
+        "batches_written": _writer.batches_written
+    }
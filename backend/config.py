@@ -54,6 +54,25 @@ if not CLAUDE_API_KEY:
 
 CLAUDE_MODEL = os.environ.get("CLAUDE_MODEL", "claude-sonnet-4-20250514")
 
+# Prompt caching: stable prompt prefixes (system prompt, API blueprint, file
+# bodies) are marked as cache breakpoints so repeat calls read them from cache.
+# Set AGENTIC_AI_PROMPT_CACHING=0 to send plain prompts.
+PROMPT_CACHING = os.environ.get("AGENTIC_AI_PROMPT_CACHING", "1") != "0"
+PROMPT_CACHING_BETA = "prompt-caching-2024-07-31"
+
+# Replies that stop at max_tokens are continued from the partial output,
+# up to this many extra calls and this many output tokens in total
+MAX_CONTINUATIONS = 4
+MAX_TOTAL_OUTPUT_TOKENS = 32000
+
+# Response cache: identical model calls (same model, system, messages and
+# max_tokens) are answered from an in-memory LRU backed by a SQLite table.
+# Set AGENTIC_AI_LLM_CACHE=0 to always call the API.
+LLM_CACHE_ENABLED = os.environ.get("AGENTIC_AI_LLM_CACHE", "1") != "0"
+LLM_CACHE_TTL = int(os.environ.get("AGENTIC_AI_LLM_CACHE_TTL", str(24 * 3600)))  # seconds
+LLM_CACHE_MEMORY_ENTRIES = 128   # responses kept in process memory
+LLM_CACHE_MAX_ENTRIES = 2000     # rows kept in SQLite (least recently used are evicted)
+
 # ===========================================================================
 # AGENT BEHAVIOR CONFIGURATION
 # ===========================================================================
@@ -73,12 +92,102 @@ Important constraints:
 - Keep improvements professional and well-documented
 """
 
+# Max file proposals generated in parallel when resolving a ticket
+PROPOSAL_CONCURRENCY = int(os.environ.get("AGENTIC_AI_PROPOSAL_CONCURRENCY", "4"))
+
+# How Claude returns file modifications: "blocks" asks for SEARCH/REPLACE edit
+# blocks applied to the original (falls back to "full" if they don't apply);
+# "full" asks for the whole modified file.
+EDIT_MODE = os.environ.get("AGENTIC_AI_EDIT_MODE", "blocks")
+
+# Conversation history is kept per session/user/ticket in a bounded LRU store
+CONVERSATION_MAX_SESSIONS = 256   # conversations kept in memory
+CONVERSATION_MAX_MESSAGES = 40    # most recent messages kept per conversation
+# Set AGENTIC_AI_PERSIST_CONVERSATIONS=1 to also store histories in SQLite
+CONVERSATION_PERSIST = os.environ.get("AGENTIC_AI_PERSIST_CONVERSATIONS", "0") == "1"
+
+# History compaction: once a conversation's messages exceed the token
+# threshold, everything but the last COMPACTION_KEEP_TURNS exchanges is folded
+# into a rolling summary (generated in the background) sent with the system prompt.
+COMPACTION_TOKEN_THRESHOLD = int(os.environ.get("AGENTIC_AI_COMPACTION_TOKENS", "8000"))
+COMPACTION_KEEP_TURNS = 4
+COMPACTION_SUMMARY_MAX_TOKENS = 1024
+
+# Token budget for a task prompt (files, API blueprint, prior findings and
+# history); lower-priority blocks are truncated or dropped to fit
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("AGENTIC_AI_CONTEXT_TOKEN_BUDGET", "60000"))
+CONTEXT_MAX_FINDINGS = 3   # prior findings (by full-text relevance) offered to the packer
+
+# File selection: projects with more files than FILE_SHORTLIST_SIZE are
+# pre-ranked locally (BM25 over paths and content) and only the top
+# candidates are sent to Claude. A clear-cut ranking of at most
+# FILE_DIRECT_SELECT_MAX files is used without asking Claude.
+FILE_SHORTLIST_SIZE = int(os.environ.get("AGENTIC_AI_FILE_SHORTLIST_SIZE", "50"))
+FILE_DIRECT_SELECT = os.environ.get("AGENTIC_AI_FILE_DIRECT_SELECT", "1") != "0"
+FILE_DIRECT_SELECT_MAX = 3
+
+# Symbol excerpts: Python/JS/TS files estimated above SYMBOL_EXCERPT_MIN_TOKENS
+# are sent as their imports plus the symbols relevant to the task (at most
+# SYMBOL_EXCERPT_MAX_SYMBOLS), with the rest reduced to signatures.
+SYMBOL_EXCERPTS = os.environ.get("AGENTIC_AI_SYMBOL_EXCERPTS", "1") != "0"
+SYMBOL_EXCERPT_MIN_TOKENS = int(os.environ.get("AGENTIC_AI_SYMBOL_EXCERPT_MIN_TOKENS", "2000"))
+SYMBOL_EXCERPT_MAX_SYMBOLS = 6
+
+# File index: the target project's files are kept in SQLite and re-walked at
+# most every FILE_INDEX_REFRESH_INTERVAL seconds; only files whose mtime or
+# size changed are re-hashed. Directories in FILE_INDEX_SKIP_DIRS, hidden
+# ones, and anything matched by .gitignore/.agentignore are pruned from the
+# walk. Set AGENTIC_AI_FILE_INDEX_USE_GIT=1 to list git checkouts with
+# `git ls-files` instead.
+FILE_INDEX_REFRESH_INTERVAL = float(os.environ.get("AGENTIC_AI_FILE_INDEX_REFRESH_INTERVAL", "2.0"))
+FILE_INDEX_SKIP_DIRS = {"node_modules", "__pycache__", "venv", ".venv", "env", "dist", "build", "coverage"}
+FILE_INDEX_USE_GIT = os.environ.get("AGENTIC_AI_FILE_INDEX_USE_GIT", "0") == "1"
+
+# File watcher: pushes target project changes into the file index and the
+# caches derived from it. "auto" uses Linux inotify and falls back to polling
+# every FILE_WATCHER_POLL_INTERVAL seconds; "poll" always polls; "off" disables it.
+FILE_WATCHER = os.environ.get("AGENTIC_AI_FILE_WATCHER", "auto")
+FILE_WATCHER_POLL_INTERVAL = 2.0
+
 # ===========================================================================
 # DATABASE CONFIGURATION
 # ===========================================================================
 
 DB_PATH = DEMO_DIR / "agent_data.db"
 
+# Connection pool: idle connections kept open for reuse across requests.
+# Connections beyond this are opened on demand and closed when released.
+DB_POOL_SIZE = int(os.environ.get("AGENTIC_AI_DB_POOL_SIZE", "8"))
+
+# Seconds a connection waits on a locked database before raising
+DB_BUSY_TIMEOUT = 5.0
+
+# Pragmas applied once to every pooled connection.
+# WAL lets readers proceed while a writer commits; NORMAL sync is safe under WAL.
+DB_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -16000,        # ~16 MB page cache per connection
+    "mmap_size": 268435456,      # 256 MB memory-mapped I/O
+}
+
+# Write-behind audit queue: history/context rows are batched off the request path
+AUDIT_BATCH_SIZE = 100         # max rows per grouped transaction
+AUDIT_FLUSH_INTERVAL = 0.5     # seconds the writer waits to fill a batch
+
+# Blob store: file bodies at least this large are zlib-compressed (if it helps)
+BLOB_COMPRESSION_MIN_SIZE = 1024  # bytes
+BLOB_COMPRESSION_LEVEL = 6
+
+# Unified diff context for proposed changes (the API accepts 0..MAX_DIFF_CONTEXT)
+DEFAULT_DIFF_CONTEXT = 3
+MAX_DIFF_CONTEXT = 50
+
+# Page sizes for cursor-paginated list endpoints (tickets, changes, context)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
 # ===========================================================================
 # UTILITY FUNCTIONS
 # ===========================================================================
@@ -0,0 +1,161 @@
+"""
+Token-budgeted prompt assembly.
+
+A task prompt is built from blocks (relevant files, the API blueprint,
+prior findings, earlier conversation turns) that compete for one token
+budget. The packer fills the budget by priority, then by relevance to
+the task, strictly in that order: each block is kept whole while it
+fits, and the first truncatable one that doesn't is cut down to a
+head/tail excerpt of the remaining room; everything ranked below it is
+dropped. The result reports what was truncated or dropped so callers can
+tell the model and the user.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from .config import CONTEXT_TOKEN_BUDGET
+from .tokens import estimate_tokens, CHARS_PER_TOKEN
+
+# Lower packs first
+KIND_PRIORITY = {"file": 0, "blueprint": 1, "history": 2, "finding": 3}
+
+# Don't bother truncating a block to fewer tokens than this
+MIN_EXCERPT_TOKENS = 200
+
+# Headroom left for the omission marker in an excerpt
+EXCERPT_MARGIN_TOKENS = 20
+
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+
+
+def task_terms(text: str) -> set:
+    """Lower-cased words of three or more characters."""
+    return {word.lower() for word in _WORD.findall(text or "")}
+
+
+def term_overlap(terms: set, text: str) -> float:
+    """Fraction of ``terms`` that appear in ``text`` (0..1)."""
+    if not terms:
+        return 0.0
+    return len(terms & task_terms(text)) / len(terms)
+
+
+def excerpt(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens, keeping its head and tail around an omission marker."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+
+    lines = text.splitlines(keepends=True)
+    head, tail = [], []
+    head_budget = max_chars * 2 // 3
+    tail_budget = max_chars - head_budget
+    used = 0
+    for line in lines:
+        if used + len(line) > head_budget:
+            break
+        head.append(line)
+        used += len(line)
+    used = 0
+    for line in reversed(lines[len(head):]):
+        if used + len(line) > tail_budget:
+            break
+        tail.insert(0, line)
+        used += len(line)
+
+    omitted = len(lines) - len(head) - len(tail)
+    return "".join(head) + f"\n... [{omitted} lines omitted to fit the context budget] ...\n" + "".join(tail)
+
+
+class ContextBlock:
+    """One candidate piece of prompt context."""
+
+    def __init__(
+        self,
+        kind: str,
+        name: str,
+        text: str,
+        relevance: float = 0.0,
+        truncatable: bool = True,
+        data=None
+    ):
+        self.kind = kind
+        self.name = name
+        self.text = text
+        self.relevance = relevance
+        self.truncatable = truncatable
+        self.data = data  # caller payload (e.g. the history messages a block stands for)
+        self.tokens = estimate_tokens(text)
+        self.truncated = False
+
+    @property
+    def priority(self) -> int:
+        return KIND_PRIORITY.get(self.kind, len(KIND_PRIORITY))
+
+
+class ContextPacker:
+    """Choose and trim blocks to fit a token budget."""
+
+    def __init__(self, budget: int = CONTEXT_TOKEN_BUDGET):
+        self.budget = budget
+
+    def pack(self, blocks: List[ContextBlock], reserved_tokens: int = 0) -> Dict:
+        """
+        Fit blocks into the budget minus ``reserved_tokens`` (fixed prompt parts).
+
+        Returns the kept blocks in their original order plus a report:
+        used/budget tokens and the truncated and dropped blocks.
+        """
+        remaining = self.budget - reserved_tokens
+        kept = set()
+        truncated = []
+        dropped = []
+
+        ranked = sorted(enumerate(blocks), key=lambda item: (item[1].priority, -item[1].relevance, item[0]))
+
+        # Strictly in rank order: the first truncatable block that doesn't fit
+        # whole gets what's left as an excerpt and closes the budget, so no
+        # lower-ranked block stays whole while a higher-ranked one was cut
+        full = False
+        for index, block in ranked:
+            if not full and block.tokens <= remaining:
+                kept.add(index)
+                remaining -= block.tokens
+            elif not full and block.truncatable and remaining >= MIN_EXCERPT_TOKENS:
+                original_tokens = block.tokens
+                block.text = excerpt(block.text, remaining - EXCERPT_MARGIN_TOKENS)
+                block.tokens = estimate_tokens(block.text)
+                block.truncated = True
+                kept.add(index)
+                remaining -= block.tokens
+                full = True
+                truncated.append({"kind": block.kind, "name": block.name,
+                                  "tokens": original_tokens, "kept_tokens": block.tokens})
+            else:
+                # A non-truncatable block that doesn't fit leaves its room to smaller ones
+                full = full or block.truncatable
+                dropped.append({"kind": block.kind, "name": block.name, "tokens": block.tokens})
+
+        return {
+            "blocks": [block for index, block in enumerate(blocks) if index in kept],
+            "budget": self.budget,
+            "used_tokens": self.budget - remaining,
+            "truncated": truncated,
+            "dropped": dropped
+        }
+
+
+def report(packed: Dict) -> Dict:
+    """The JSON-friendly part of a pack() result."""
+    return {key: packed[key] for key in ("budget", "used_tokens", "truncated", "dropped")}
+
+
+def kept(packed: Dict, kind: str) -> List[ContextBlock]:
+    """Kept blocks of one kind, in original order."""
+    return [block for block in packed["blocks"] if block.kind == kind]
+
+
+def first_kept(packed: Dict, kind: str) -> Optional[ContextBlock]:
+    blocks = kept(packed, kind)
+    return blocks[0] if blocks else None
@@ -0,0 +1,223 @@
+"""
+Per-conversation chat history.
+
+Each browser session (or logged-in user) gets its own history, and ticket
+chats get one per ticket, so requests only send the context that belongs
+to them. Histories live in a bounded LRU; each keeps its latest
+CONVERSATION_MAX_MESSAGES messages. With CONVERSATION_PERSIST enabled they
+are also written to the conversation_messages table and reloaded on demand.
+
+Long conversations are compacted: once the messages pass
+COMPACTION_TOKEN_THRESHOLD, or reach the CONVERSATION_MAX_MESSAGES cap,
+all but the last COMPACTION_KEEP_TURNS exchanges are folded into a
+rolling summary by a background worker, so the input sent per turn stays
+roughly constant. Messages the cap pushes out before a compaction has
+run are folded into the summary too rather than dropped (unless that
+compaction fails).
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from . import database as db
+from .config import (
+    CONVERSATION_MAX_SESSIONS,
+    CONVERSATION_MAX_MESSAGES,
+    CONVERSATION_PERSIST,
+    COMPACTION_TOKEN_THRESHOLD,
+    COMPACTION_KEEP_TURNS
+)
+from .tokens import estimate_message_tokens
+
+logger = logging.getLogger(__name__)
+
+# Key used when a caller has no session (scripts, the CLI)
+DEFAULT_CONVERSATION = "default"
+
+# summarizer(previous_summary, messages) -> new summary
+Summarizer = Callable[[Optional[str], List[Dict]], str]
+
+
+class ConversationStore:
+    """Bounded, optionally persistent map of conversation key -> messages and summary."""
+
+    def __init__(
+        self,
+        summarizer: Optional[Summarizer] = None,
+        max_conversations: int = CONVERSATION_MAX_SESSIONS,
+        max_messages: int = CONVERSATION_MAX_MESSAGES,
+        persist: bool = CONVERSATION_PERSIST,
+        compaction_threshold: int = COMPACTION_TOKEN_THRESHOLD,
+        keep_turns: int = COMPACTION_KEEP_TURNS
+    ):
+        self.summarizer = summarizer
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.persist = persist
+        self.compaction_threshold = compaction_threshold
+        self.keep_turns = keep_turns
+        # key -> {"messages": [...], "summary": str or None, "evicted": [...]}
+        # ("evicted": messages pushed out by the cap, waiting to be summarized)
+        self._conversations: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._compacting = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="compaction")
+        self.compactions = 0
+
+    def history(self, key: str) -> List[Dict]:
+        """Return a copy of the conversation's verbatim messages, oldest first."""
+        return list(self._load(key)["messages"])
+
+    def summary(self, key: str) -> Optional[str]:
+        """Return the rolling summary of the conversation's compacted turns."""
+        return self._load(key)["summary"]
+
+    def append_turn(self, key: str, user_content: str, assistant_content: str):
+        """Record a completed user/assistant exchange, compacting if it got too long."""
+        turn = [
+            {"role": "user", "content": user_content},
+            {"role": "assistant", "content": assistant_content}
+        ]
+        self._load(key)  # make sure persisted messages are loaded first
+
+        with self._lock:
+            conversation = self._conversations.setdefault(key, {"messages": [], "summary": None, "evicted": []})
+            messages = conversation["messages"] + turn
+            conversation["messages"] = self._trim(messages)
+            if self.summarizer is not None:
+                # Held until the compaction queued below summarizes them
+                conversation["evicted"].extend(messages[:len(messages) - len(conversation["messages"])])
+            self._conversations.move_to_end(key)
+            self._evict()
+            should_compact = self._needs_compaction(key, conversation)
+            if should_compact:
+                self._compacting.add(key)
+
+        if self.persist:
+            try:
+                db.append_conversation_messages(key, turn, self.max_messages)
+            except Exception as e:
+                logger.warning(f"Could not persist conversation {key}: {e}")
+
+        if should_compact:
+            self._executor.submit(self._compact, key)
+
+    def clear(self, key: str):
+        """Forget a conversation (memory and, if persisted, SQLite)."""
+        with self._lock:
+            self._conversations.pop(key, None)
+        if self.persist:
+            db.delete_conversation(key)
+
+    def _load(self, key: str) -> Dict:
+        with self._lock:
+            conversation = self._conversations.get(key)
+            if conversation is not None:
+                self._conversations.move_to_end(key)
+                return conversation
+
+        loaded = {"messages": [], "summary": None, "evicted": []}
+        if self.persist:
+            try:
+                loaded["messages"] = self._trim(db.get_conversation_messages(key, self.max_messages))
+                loaded["summary"] = db.get_conversation_summary(key)
+            except Exception as e:
+                logger.warning(f"Could not load conversation {key}: {e}")
+
+        with self._lock:
+            # Another request may have loaded or extended it meanwhile
+            conversation = self._conversations.setdefault(key, loaded)
+            self._conversations.move_to_end(key)
+            self._evict()
+            return conversation
+
+    def _needs_compaction(self, key: str, conversation: Dict) -> bool:
+        # Caller holds self._lock
+        if self.summarizer is None or key in self._compacting:
+            return False
+        messages = conversation["messages"]
+        if conversation["evicted"] or len(messages) >= self.max_messages:
+            return True
+        return (
+            len(messages) > self.keep_turns * 2
+            and estimate_message_tokens(messages) > self.compaction_threshold
+        )
+
+    def _compact(self, key: str):
+        """Fold evicted messages and all but the last keep_turns exchanges into the summary (worker thread)."""
+        evicted = []
+        try:
+            with self._lock:
+                conversation = self._conversations.get(key)
+                if conversation is None:
+                    return
+                evicted = list(conversation["evicted"])
+                older = conversation["messages"][:-self.keep_turns * 2]
+                previous_summary = conversation["summary"]
+            if not evicted and not older:
+                return
+
+            summary = self.summarizer(previous_summary, evicted + older)
+
+            with self._lock:
+                conversation = self._conversations.get(key)
+                if conversation is None:
+                    return
+                # Turns appended meanwhile stay; only drop what was summarized
+                # (the cap may already have moved some of it to evicted)
+                messages = conversation["messages"]
+                remaining = [message for message in older if any(message is m for m in messages)]
+                conversation["messages"] = messages[len(remaining):]
+                conversation["evicted"] = [
+                    message for message in conversation["evicted"][len(evicted):]
+                    if not any(message is m for m in older)
+                ]
+                conversation["summary"] = summary
+                kept = list(conversation["messages"])
+                self.compactions += 1
+
+            if self.persist:
+                db.replace_conversation(key, summary, kept)
+            logger.info(
+                f"Compacted conversation {key}: {len(evicted) + len(older)} messages summarized, {len(kept)} kept"
+            )
+
+        except Exception as e:
+            logger.error(f"Error compacting conversation {key}: {e}")
+            if evicted:
+                # Can't summarize them; don't let them pile up either
+                with self._lock:
+                    conversation = self._conversations.get(key)
+                    if conversation is not None:
+                        conversation["evicted"] = conversation["evicted"][len(evicted):]
+                logger.warning(f"Conversation {key}: dropped {len(evicted)} unsummarized messages")
+        finally:
+            with self._lock:
+                self._compacting.discard(key)
+
+    def _trim(self, messages: List[Dict]) -> List[Dict]:
+        """Keep the latest max_messages, starting on a user turn."""
+        messages = messages[-self.max_messages:]
+        while messages and messages[0]["role"] != "user":
+            messages = messages[1:]
+        return messages
+
+    def _evict(self):
+        # Caller holds self._lock
+        while len(self._conversations) > self.max_conversations:
+            self._conversations.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """Conversation counts for the status endpoint."""
+        with self._lock:
+            return {
+                "conversations": len(self._conversations),
+                "messages": sum(len(c["messages"]) for c in self._conversations.values()),
+                "summarized": sum(1 for c in self._conversations.values() if c["summary"]),
+                "compactions": self.compactions,
+                "compacting": len(self._compacting),
+                "persisted": self.persist
+            }
@@ -7,128 +7,726 @@ SQLite database for tracking:
 - Tickets (creator, category, status)
 - Changes history (project, files affected, ticket reference)
 - AI Context (summaries, findings, recommendations)
+
+Connections come from a shared pool: each connection is opened once,
+switched to WAL mode and reused. Use ``connection()`` for reads and
+``transaction()`` for writes; nested scopes on the same thread share
+one connection, so a ``transaction()`` can wrap several helpers and
+commit them together.
 """
 
+import atexit
+import base64
+import hashlib
+import logging
+import queue
+import re
 import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 import json
 
-from .config import DB_PATH
+from .config import (
+    DB_PATH,
+    DB_POOL_SIZE,
+    DB_BUSY_TIMEOUT,
+    DB_PRAGMAS,
+    BLOB_COMPRESSION_MIN_SIZE,
+    BLOB_COMPRESSION_LEVEL,
+    DEFAULT_DIFF_CONTEXT
+)
+from .diffs import unified_diff, diff_stats
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONNECTION POOL
+# =============================================================================
+
+class ConnectionPool:
+    """
+    Pool of long-lived SQLite connections.
+
+    A thread checks out one connection for the outermost ``connection()``
+    or ``transaction()`` scope and returns it when that scope exits.
+    Inner scopes on the same thread reuse the checked-out connection.
+    """
 
+    def __init__(self, db_path: Path, max_idle: int = DB_POOL_SIZE):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self._idle = queue.LifoQueue()
+        self._local = threading.local()
+        self._closed = False
+
+    def _open(self) -> sqlite3.Connection:
+        """Open a new connection with row factory and tuned pragmas."""
+        # isolation_level=None: autocommit, transactions are explicit BEGIN/COMMIT
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=DB_BUSY_TIMEOUT,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma, value in DB_PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        return conn
 
-def get_connection():
-    """Get database connection with row factory."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._open()
+
+    def _release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed or self._idle.qsize() >= self.max_idle:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Yield this thread's connection, checking one out if needed."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Yield a connection inside a write transaction; commit on success."""
+        with self.connection() as conn:
+            if conn.in_transaction:
+                # Joined an outer transaction; it owns commit/rollback
+                yield conn
+                return
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def close(self):
+        """Close all idle connections. Checked-out ones close on release."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH)
+                atexit.register(_pool.close)
+    return _pool
+
+
+def close_pool():
+    """Close the connection pool (used on shutdown and in scripts)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def connection():
+    """Context manager yielding a pooled connection for reads."""
+    return get_pool().connection()
+
+
+def transaction():
+    """Context manager yielding a pooled connection inside a transaction."""
+    return get_pool().transaction()
+
+
+# Secondary indexes matching the filters and ORDER BY of the list queries.
+# SQLite appends the rowid to every index, so (..., created_at) also yields
+# a stable (created_at, id) order without a temp sort.
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_tickets_created ON tickets(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_status_created ON tickets(status, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_project_created ON tickets(project_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_project_status_created ON tickets(project_id, status, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_category_created ON tickets(category, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_proposed_changes_ticket_created ON proposed_changes(ticket_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_proposed_changes_status_created ON proposed_changes(status, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_changes_history_created ON changes_history(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_changes_history_project_created ON changes_history(project_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_ai_context_created ON ai_context(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_ai_context_project_created ON ai_context(project_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_ai_context_type_created ON ai_context(context_type, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_ai_context_project_type_created ON ai_context(project_id, context_type, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_conversation_messages_key ON conversation_messages(conversation_key, id)",
+]
 
 
 def init_database():
     """Initialize database with all required tables."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    with transaction() as conn:
+        cursor = conn.cursor()
+
+        # Users table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password_hash TEXT,
+                role TEXT NOT NULL CHECK(role IN ('admin', 'tester', 'developer')),
+                email TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Projects table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS projects (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                path TEXT NOT NULL,
+                description TEXT,
+                frontend_url TEXT,
+                backend_url TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Tickets table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tickets (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                description TEXT,
+                category TEXT NOT NULL CHECK(category IN ('bug', 'feature', 'task', 'improvement')),
+                status TEXT DEFAULT 'open' CHECK(status IN ('open', 'in_progress', 'resolved', 'closed')),
+                priority TEXT DEFAULT 'medium' CHECK(priority IN ('low', 'medium', 'high', 'critical')),
+                creator_id INTEGER,
+                assignee_id INTEGER,
+                project_id INTEGER,
+                ai_suggestion TEXT,
+                ai_suggestion_status TEXT CHECK(ai_suggestion_status IN ('pending', 'accepted', 'rejected', NULL)),
+                ai_files_analyzed TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (creator_id) REFERENCES users(id),
+                FOREIGN KEY (assignee_id) REFERENCES users(id),
+                FOREIGN KEY (project_id) REFERENCES projects(id)
+            )
+        """)
+
+        # Changes history table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS changes_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                project_id INTEGER,
+                ticket_id INTEGER,
+                files_affected TEXT,
+                change_type TEXT CHECK(change_type IN ('create', 'modify', 'delete', 'analyze')),
+                change_summary TEXT,
+                ai_response TEXT,
+                user_id INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (project_id) REFERENCES projects(id),
+                FOREIGN KEY (ticket_id) REFERENCES tickets(id),
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        """)
+
+        # AI Context table - stores summaries and findings
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ai_context (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                project_id INTEGER,
+                context_type TEXT CHECK(context_type IN ('summary', 'finding', 'recommendation', 'note')),
+                title TEXT,
+                content TEXT NOT NULL,
+                tags TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (project_id) REFERENCES projects(id)
+            )
+        """)
+
+        # Blobs table - content-addressed, deduplicated file bodies
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                compressed INTEGER NOT NULL DEFAULT 0,
+                data BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Proposed changes table - stores AI proposed code changes for review.
+        # File bodies live in blobs (original_hash/proposed_hash); the legacy
+        # *_content columns are left empty for new rows.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS proposed_changes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ticket_id INTEGER,
+                file_path TEXT NOT NULL,
+                original_content TEXT,
+                proposed_content TEXT NOT NULL,
+                change_description TEXT,
+                status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'accepted', 'rejected')),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                resolved_at TIMESTAMP,
+                original_hash TEXT REFERENCES blobs(hash),
+                proposed_hash TEXT REFERENCES blobs(hash),
+                FOREIGN KEY (ticket_id) REFERENCES tickets(id)
+            )
+        """)
+        # Diff cache - unified diffs between two blobs, per context size
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS diff_cache (
+                original_hash TEXT,
+                proposed_hash TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                context_lines INTEGER NOT NULL,
+                diff TEXT NOT NULL,
+                lines_added INTEGER NOT NULL,
+                lines_removed INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (original_hash, proposed_hash, file_path, context_lines)
+            )
+        """)
+
+        # LLM usage - token accounting per model call, including prompt-cache reads/writes
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS llm_usage (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                purpose TEXT NOT NULL,
+                model TEXT,
+                input_tokens INTEGER NOT NULL DEFAULT 0,
+                output_tokens INTEGER NOT NULL DEFAULT 0,
+                cache_creation_input_tokens INTEGER NOT NULL DEFAULT 0,
+                cache_read_input_tokens INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # LLM response cache - model replies keyed by a hash of the request
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS llm_response_cache (
+                cache_key TEXT PRIMARY KEY,
+                purpose TEXT,
+                model TEXT,
+                response TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) WITHOUT ROWID
+        """)
+
+        # Conversation messages - optional persistence for per-session chat history
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS conversation_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                conversation_key TEXT NOT NULL,
+                role TEXT NOT NULL CHECK(role IN ('user', 'assistant')),
+                content TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS conversation_summaries (
+                conversation_key TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # File index - the target project's files, refreshed incrementally by mtime/size
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS file_index (
+                root TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                content_hash TEXT,
+                extension TEXT NOT NULL,
+                indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (root, path)
+            ) WITHOUT ROWID
+        """)
+
+        _add_column_if_missing(cursor, "proposed_changes", "original_hash", "TEXT REFERENCES blobs(hash)")
+        _add_column_if_missing(cursor, "proposed_changes", "proposed_hash", "TEXT REFERENCES blobs(hash)")
+        _migrate_proposed_change_bodies(cursor)
+
+        for statement in INDEXES:
+            cursor.execute(statement)
+
+        _init_search_index(cursor)
+        _init_link_tables(cursor)
+        _init_dashboard_stats(cursor)
+
+    # Refresh planner statistics for any index that changed
+    with connection() as conn:
+        conn.execute("PRAGMA optimize")
+
+
+def _add_column_if_missing(cursor, table: str, column: str, declaration: str):
+    """Add a column to an existing table (CREATE TABLE IF NOT EXISTS won't)."""
+    columns = {row['name'] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+
+def _migrate_proposed_change_bodies(cursor):
+    """Move inline bodies of pre-blob proposed changes into the blob store."""
+    rows = cursor.execute(
+        "SELECT id, original_content, proposed_content FROM proposed_changes WHERE proposed_hash IS NULL"
+    ).fetchall()
+    for row in rows:
+        cursor.execute(
+            """UPDATE proposed_changes
+               SET original_hash = ?, proposed_hash = ?, original_content = NULL, proposed_content = ''
+               WHERE id = ?""",
+            (put_blob(row['original_content']), put_blob(row['proposed_content'] or ''), row['id'])
+        )
+    if rows:
+        logger.info(f"Moved {len(rows)} proposed change bodies into the blob store")
 
-    # Users table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT,
-            role TEXT NOT NULL CHECK(role IN ('admin', 'tester', 'developer')),
-            email TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+
+# Full-text search sources: result type -> (table, indexed columns, bm25 weights)
+SEARCH_SOURCES = {
+    "ticket": ("tickets", ["title", "description", "ai_suggestion"], [10.0, 2.0, 1.0]),
+    "context": ("ai_context", ["title", "content"], [5.0, 1.0]),
+    "change": ("changes_history", ["change_summary"], [1.0]),
+}
+
+# Set by init_database(); False when this SQLite build lacks FTS5
+FTS_AVAILABLE = False
+
+
+def _init_search_index(cursor):
+    """
+    Create external-content FTS5 tables mirroring the searchable columns,
+    plus triggers that keep them in sync. Backfills on first creation.
+    """
+    global FTS_AVAILABLE
+
+    for table, columns, _ in SEARCH_SOURCES.values():
+        fts = f"{table}_fts"
+        cols = ", ".join(columns)
+        new_cols = ", ".join(f"new.{c}" for c in columns)
+        old_cols = ", ".join(f"old.{c}" for c in columns)
+
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)
+        ).fetchone()
+
+        try:
+            cursor.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                    {cols}, content='{table}', content_rowid='id', tokenize='porter unicode61'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Full-text search disabled: {e}")
+            FTS_AVAILABLE = False
+            return
+
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+            END
+        """)
+        # Only re-index when a searchable column changes, not on status updates
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols});
+            END
+        """)
+
+        if not exists:
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+    FTS_AVAILABLE = True
+
+
+# Normalized link tables derived from JSON list columns:
+# link table -> (source table, source id column, JSON column, link id column, value column)
+LINK_TABLES = {
+    "context_tags": ("ai_context", "context_id", "tags", "tag"),
+    "change_files": ("changes_history", "change_id", "files_affected", "file_path"),
+    "ticket_files": ("tickets", "ticket_id", "ai_files_analyzed", "file_path"),
+}
+
+
+def _init_link_tables(cursor):
+    """
+    Create indexed link tables for tags and touched files, kept in sync
+    with their JSON source columns by triggers (json_each), so rows can
+    be filtered by tag or file without decoding every row.
+    """
+    for link, (table, id_col, json_col, value_col) in LINK_TABLES.items():
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (link,)
+        ).fetchone()
+
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {link} (
+                {id_col} INTEGER NOT NULL REFERENCES {table}(id),
+                {value_col} TEXT NOT NULL,
+                PRIMARY KEY ({id_col}, {value_col})
+            ) WITHOUT ROWID
+        """)
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{link}_{value_col} ON {link}({value_col}, {id_col})"
         )
-    """)
 
-    # Projects table
+        insert_new = f"""
+            INSERT OR IGNORE INTO {link} ({id_col}, {value_col})
+            SELECT new.id, value FROM json_each(
+                CASE WHEN json_valid(new.{json_col}) THEN new.{json_col} ELSE '[]' END
+            ) WHERE type = 'text';
+        """
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {link}_ai AFTER INSERT ON {table} BEGIN
+                {insert_new}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {link}_au AFTER UPDATE OF {json_col} ON {table} BEGIN
+                DELETE FROM {link} WHERE {id_col} = old.id;
+                {insert_new}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {link}_ad AFTER DELETE ON {table} BEGIN
+                DELETE FROM {link} WHERE {id_col} = old.id;
+            END
+        """)
+
+        if not exists:
+            cursor.execute(f"""
+                INSERT OR IGNORE INTO {link} ({id_col}, {value_col})
+                SELECT src.id, j.value
+                FROM {table} src, json_each(
+                    CASE WHEN json_valid(src.{json_col}) THEN src.{json_col} ELSE '[]' END
+                ) j
+                WHERE j.type = 'text'
+            """)
+
+    # A proposed change also means its ticket touches that file
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS projects (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            path TEXT NOT NULL,
-            description TEXT,
-            frontend_url TEXT,
-            backend_url TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
+        CREATE TRIGGER IF NOT EXISTS ticket_files_proposed_ai AFTER INSERT ON proposed_changes
+        WHEN new.ticket_id IS NOT NULL BEGIN
+            INSERT OR IGNORE INTO ticket_files (ticket_id, file_path) VALUES (new.ticket_id, new.file_path);
+        END
     """)
-
-    # Tickets table
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS tickets (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            category TEXT NOT NULL CHECK(category IN ('bug', 'feature', 'task', 'improvement')),
-            status TEXT DEFAULT 'open' CHECK(status IN ('open', 'in_progress', 'resolved', 'closed')),
-            priority TEXT DEFAULT 'medium' CHECK(priority IN ('low', 'medium', 'high', 'critical')),
-            creator_id INTEGER,
-            assignee_id INTEGER,
-            project_id INTEGER,
-            ai_suggestion TEXT,
-            ai_suggestion_status TEXT CHECK(ai_suggestion_status IN ('pending', 'accepted', 'rejected', NULL)),
-            ai_files_analyzed TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (creator_id) REFERENCES users(id),
-            FOREIGN KEY (assignee_id) REFERENCES users(id),
-            FOREIGN KEY (project_id) REFERENCES projects(id)
-        )
+        INSERT OR IGNORE INTO ticket_files (ticket_id, file_path)
+        SELECT ticket_id, file_path FROM proposed_changes WHERE ticket_id IS NOT NULL
     """)
 
-    # Changes history table
+
+# Ticket columns counted by the dashboard; NULLs are counted under 'none'
+TICKET_STAT_DIMENSIONS = ["status", "priority", "category", "ai_suggestion_status"]
+
+
+def _stat_upserts(table: str, rows: List[tuple]) -> str:
+    """SQL that adds delta to each (key columns) counter row."""
+    statements = []
+    for keys, values, delta in rows:
+        statements.append(f"""
+            INSERT INTO {table} ({", ".join(keys)}, count) VALUES ({", ".join(values)}, {delta})
+            ON CONFLICT({", ".join(keys)}) DO UPDATE SET count = count + excluded.count;""")
+    return "".join(statements)
+
+
+def _init_dashboard_stats(cursor):
+    """
+    Create the materialized counters behind /api/dashboard/summary and the
+    triggers that keep them current on every ticket / proposal write.
+    """
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ticket_stats'"
+    ).fetchone()
+
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS changes_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            project_id INTEGER,
-            ticket_id INTEGER,
-            files_affected TEXT,
-            change_type TEXT CHECK(change_type IN ('create', 'modify', 'delete', 'analyze')),
-            change_summary TEXT,
-            ai_response TEXT,
-            user_id INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (project_id) REFERENCES projects(id),
-            FOREIGN KEY (ticket_id) REFERENCES tickets(id),
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
+        CREATE TABLE IF NOT EXISTS ticket_stats (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, value)
+        ) WITHOUT ROWID
     """)
-
-    # AI Context table - stores summaries and findings
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS ai_context (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            project_id INTEGER,
-            context_type TEXT CHECK(context_type IN ('summary', 'finding', 'recommendation', 'note')),
-            title TEXT,
-            content TEXT NOT NULL,
-            tags TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (project_id) REFERENCES projects(id)
-        )
+        CREATE TABLE IF NOT EXISTS proposed_change_stats (
+            status TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
     """)
 
-    # Proposed changes table - stores AI proposed code changes for review
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS proposed_changes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ticket_id INTEGER,
-            file_path TEXT NOT NULL,
-            original_content TEXT,
-            proposed_content TEXT NOT NULL,
-            change_description TEXT,
-            status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'accepted', 'rejected')),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            resolved_at TIMESTAMP,
-            FOREIGN KEY (ticket_id) REFERENCES tickets(id)
-        )
+    def ticket_rows(ref: str, delta: int):
+        return [
+            (["dimension", "value"], [f"'{dim}'", f"COALESCE({ref}.{dim}, 'none')"], delta)
+            for dim in TICKET_STAT_DIMENSIONS
+        ]
+
+    dims = ", ".join(TICKET_STAT_DIMENSIONS)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS ticket_stats_ai AFTER INSERT ON tickets BEGIN
+            {_stat_upserts("ticket_stats", ticket_rows("new", 1))}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS ticket_stats_ad AFTER DELETE ON tickets BEGIN
+            {_stat_upserts("ticket_stats", ticket_rows("old", -1))}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS ticket_stats_au AFTER UPDATE OF {dims} ON tickets BEGIN
+            {_stat_upserts("ticket_stats", ticket_rows("old", -1) + ticket_rows("new", 1))}
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS proposed_change_stats_ai AFTER INSERT ON proposed_changes BEGIN
+            {_stat_upserts("proposed_change_stats", [(["status"], ["COALESCE(new.status, 'pending')"], 1)])}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS proposed_change_stats_ad AFTER DELETE ON proposed_changes BEGIN
+            {_stat_upserts("proposed_change_stats", [(["status"], ["COALESCE(old.status, 'pending')"], -1)])}
+        END
     """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS proposed_change_stats_au AFTER UPDATE OF status ON proposed_changes BEGIN
+            {_stat_upserts("proposed_change_stats", [
+                (["status"], ["COALESCE(old.status, 'pending')"], -1),
+                (["status"], ["COALESCE(new.status, 'pending')"], 1),
+            ])}
+        END
+    """)
+
+    if not exists:
+        rebuild_dashboard_stats()
+
 
-    conn.commit()
-    conn.close()
+def rebuild_dashboard_stats():
+    """Recompute the dashboard counters from scratch (first run or repair)."""
+    with transaction() as conn:
+        conn.execute("DELETE FROM ticket_stats")
+        for dim in TICKET_STAT_DIMENSIONS:
+            conn.execute(f"""
+                INSERT INTO ticket_stats (dimension, value, count)
+                SELECT '{dim}', COALESCE({dim}, 'none'), COUNT(*) FROM tickets GROUP BY 2
+            """)
+        conn.execute("DELETE FROM proposed_change_stats")
+        conn.execute("""
+            INSERT INTO proposed_change_stats (status, count)
+            SELECT COALESCE(status, 'pending'), COUNT(*) FROM proposed_changes GROUP BY 1
+        """)
+
+
+def audit_query_plans() -> List[Dict]:
+    """
+    Run EXPLAIN QUERY PLAN on each hot list query and log full scans.
+
+    Returns the offending plan steps (empty when every query is indexed).
+    """
+    problems = []
+    with connection() as conn:
+        for name, (query, params) in _hot_queries().items():
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+            for step in plan:
+                detail = step['detail']
+                full_scan = detail.startswith('SCAN ') and ' USING ' not in detail
+                temp_sort = 'USE TEMP B-TREE' in detail
+                if full_scan or temp_sort:
+                    problems.append({"query": name, "detail": detail})
+                    logger.warning(f"Query plan for {name}: {detail}")
+
+    if not problems:
+        logger.info("Query plan audit passed: all hot queries use indexes")
+    return problems
+
+
+# =============================================================================
+# KEYSET PAGINATION
+# =============================================================================
+# List queries order by (created_at DESC, id DESC). A cursor encodes the
+# (created_at, id) of the last row on a page; the next page starts strictly
+# after it, so each page is an index range scan regardless of table size.
+
+def encode_cursor(row: Dict) -> str:
+    """Encode a row's (created_at, id) position as an opaque cursor."""
+    raw = json.dumps([row['created_at'], row['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decode a cursor back to (created_at, id). Raises ValueError if malformed."""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def split_page(rows: List[Dict], limit: int) -> tuple:
+    """
+    Split a ``limit + 1`` fetch into (page, next_cursor).
+
+    next_cursor is None when there are no more rows.
+    """
+    if len(rows) > limit:
+        page = rows[:limit]
+        return page, encode_cursor(page[-1])
+    return rows, None
+
+
+def _apply_keyset(query: str, params: list, alias: str, limit: Optional[int], cursor: Optional[str]):
+    """Append the keyset condition, ordering and limit to a list query."""
+    prefix = f"{alias}." if alias else ""
+    if cursor:
+        query += f" AND ({prefix}created_at, {prefix}id) < (?, ?)"
+        params.extend(decode_cursor(cursor))
+    query += f" ORDER BY {prefix}created_at DESC, {prefix}id DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    return query, params
 
 
 # =============================================================================
@@ -137,51 +735,37 @@ def init_database():
 
 def create_user(username: str, role: str, email: Optional[str] = None) -> int:
     """Create a new user."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO users (username, role, email) VALUES (?, ?, ?)",
-        (username, role, email)
-    )
-    conn.commit()
-    user_id = cursor.lastrowid
-    conn.close()
-    return user_id
+    with transaction() as conn:
+        cursor = conn.execute(
+            "INSERT INTO users (username, role, email) VALUES (?, ?, ?)",
+            (username, role, email)
+        )
+        return cursor.lastrowid
 
 
 def get_users() -> List[Dict]:
     """Get all users."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users ORDER BY created_at DESC")
-    users = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return users
+    with connection() as conn:
+        cursor = conn.execute("SELECT * FROM users ORDER BY created_at DESC")
+        return [dict(row) for row in cursor.fetchall()]
 
 
 def get_user_by_id(user_id: int) -> Optional[Dict]:
     """Get user by ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with connection() as conn:
+        row = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
     return dict(row) if row else None
 
 
 def get_user_by_username(username: str) -> Optional[Dict]:
     """Get user by username for login."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-    row = cursor.fetchone()
-    conn.close()
+    with connection() as conn:
+        row = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
     return dict(row) if row else None
 
 
 def seed_default_users():
     """Seed default users with simple password."""
-    import hashlib
     password_hash = hashlib.sha256("demo123".encode()).hexdigest()
 
     default_users = [
@@ -191,24 +775,106 @@ def seed_default_users():
         ("tester1", "tester", "tester1@example.com"),
     ]
 
-    conn = get_connection()
-    cursor = conn.cursor()
-    for username, role, email in default_users:
-        try:
-            cursor.execute(
-                "INSERT OR IGNORE INTO users (username, password_hash, role, email) VALUES (?, ?, ?, ?)",
-                (username, password_hash, role, email)
-            )
-        except Exception:
-            pass
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        for username, role, email in default_users:
+            try:
+                conn.execute(
+                    "INSERT OR IGNORE INTO users (username, password_hash, role, email) VALUES (?, ?, ?, ?)",
+                    (username, password_hash, role, email)
+                )
+            except Exception:
+                pass
+
+
+# =============================================================================
+# BLOB OPERATIONS
+# =============================================================================
+
+def put_blob(content: Optional[str]) -> Optional[str]:
+    """
+    Store text in the content-addressed blob table and return its SHA-256.
+
+    Identical content is stored once. Bodies above BLOB_COMPRESSION_MIN_SIZE
+    are zlib-compressed when that actually saves space.
+    """
+    if content is None:
+        return None
+
+    raw = content.encode('utf-8')
+    blob_hash = hashlib.sha256(raw).hexdigest()
+
+    data, compressed = raw, 0
+    if len(raw) >= BLOB_COMPRESSION_MIN_SIZE:
+        packed = zlib.compress(raw, BLOB_COMPRESSION_LEVEL)
+        if len(packed) < len(raw):
+            data, compressed = packed, 1
+
+    with transaction() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO blobs (hash, size, compressed, data) VALUES (?, ?, ?, ?)",
+            (blob_hash, len(raw), compressed, data)
+        )
+    return blob_hash
+
+
+def _decode_blob(row) -> str:
+    data = zlib.decompress(row['data']) if row['compressed'] else row['data']
+    return data.decode('utf-8')
+
+
+def get_blobs(hashes: List[str]) -> Dict[str, str]:
+    """Fetch several blobs in one query. Returns {hash: text}."""
+    wanted = list({h for h in hashes if h})
+    if not wanted:
+        return {}
+
+    placeholders = ", ".join("?" for _ in wanted)
+    with connection() as conn:
+        rows = conn.execute(
+            f"SELECT hash, compressed, data FROM blobs WHERE hash IN ({placeholders})", wanted
+        ).fetchall()
+    return {row['hash']: _decode_blob(row) for row in rows}
+
+
+def get_blob(blob_hash: str) -> Optional[str]:
+    """Fetch one blob's text by hash."""
+    return get_blobs([blob_hash]).get(blob_hash)
 
 
 # =============================================================================
 # PROPOSED CHANGES OPERATIONS
 # =============================================================================
 
+# Metadata columns returned by proposal listings; bodies are fetched separately
+PROPOSED_CHANGE_COLUMNS = """
+    pc.id, pc.ticket_id, pc.file_path, pc.change_description, pc.status,
+    pc.created_at, pc.resolved_at, pc.original_hash, pc.proposed_hash,
+    ob.size AS original_size, nb.size AS proposed_size,
+    dc.lines_added, dc.lines_removed
+"""
+
+PROPOSED_CHANGE_FROM = f"""
+    FROM proposed_changes pc
+    LEFT JOIN blobs ob ON ob.hash = pc.original_hash
+    LEFT JOIN blobs nb ON nb.hash = pc.proposed_hash
+    LEFT JOIN diff_cache dc ON dc.original_hash IS pc.original_hash
+        AND dc.proposed_hash = pc.proposed_hash
+        AND dc.file_path = pc.file_path
+        AND dc.context_lines = {int(DEFAULT_DIFF_CONTEXT)}
+"""
+
+
+def _hydrate_proposed_changes(changes: List[Dict]) -> List[Dict]:
+    """Attach original_content/proposed_content from the blob store."""
+    bodies = get_blobs(
+        [c['original_hash'] for c in changes] + [c['proposed_hash'] for c in changes]
+    )
+    for change in changes:
+        change['original_content'] = bodies.get(change['original_hash'])
+        change['proposed_content'] = bodies.get(change['proposed_hash'])
+    return changes
+
+
 def create_proposed_change(
     file_path: str,
     original_content: str,
@@ -216,70 +882,170 @@ def create_proposed_change(
     change_description: str,
     ticket_id: Optional[int] = None
 ) -> int:
-    """Create a proposed change for review."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """INSERT INTO proposed_changes
-           (ticket_id, file_path, original_content, proposed_content, change_description)
-           VALUES (?, ?, ?, ?, ?)""",
-        (ticket_id, file_path, original_content, proposed_content, change_description)
-    )
-    conn.commit()
-    change_id = cursor.lastrowid
-    conn.close()
-    return change_id
-
-
-def get_proposed_change(change_id: int) -> Optional[Dict]:
-    """Get a proposed change by ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM proposed_changes WHERE id = ?", (change_id,))
-    row = cursor.fetchone()
-    conn.close()
-    return dict(row) if row else None
+    """Create a proposed change for review, caching its default-context diff."""
+    with transaction() as conn:
+        original_hash = put_blob(original_content)
+        proposed_hash = put_blob(proposed_content)
+        cursor = conn.execute(
+            """INSERT INTO proposed_changes
+               (ticket_id, file_path, proposed_content, change_description, original_hash, proposed_hash)
+               VALUES (?, ?, '', ?, ?, ?)""",
+            (ticket_id, file_path, change_description, original_hash, proposed_hash)
+        )
+        _store_diff(
+            original_hash, proposed_hash, file_path, DEFAULT_DIFF_CONTEXT,
+            unified_diff(original_content, proposed_content, file_path, DEFAULT_DIFF_CONTEXT)
+        )
+        return cursor.lastrowid
 
 
-def get_proposed_changes_for_ticket(ticket_id: int) -> List[Dict]:
-    """Get all proposed changes for a ticket."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT * FROM proposed_changes WHERE ticket_id = ? ORDER BY created_at DESC",
-        (ticket_id,)
-    )
-    changes = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return changes
+def _store_diff(original_hash, proposed_hash, file_path, context_lines, diff) -> Dict:
+    added, removed = diff_stats(diff)
+    with transaction() as conn:
+        conn.execute(
+            """INSERT OR REPLACE INTO diff_cache
+               (original_hash, proposed_hash, file_path, context_lines, diff, lines_added, lines_removed)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (original_hash, proposed_hash, file_path, context_lines, diff, added, removed)
+        )
+    return {"diff": diff, "lines_added": added, "lines_removed": removed}
 
 
-def get_pending_proposed_changes() -> List[Dict]:
-    """Get all pending proposed changes."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT * FROM proposed_changes WHERE status = 'pending' ORDER BY created_at DESC"
-    )
-    changes = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+def get_diff(
+    original_hash: Optional[str],
+    proposed_hash: str,
+    file_path: str,
+    context_lines: int = DEFAULT_DIFF_CONTEXT
+) -> Dict:
+    """
+    Get the unified diff between two blobs, computing and caching it on a miss.
+
+    Blobs are immutable, so a cached diff never goes stale.
+    """
+    with connection() as conn:
+        row = conn.execute(
+            """SELECT diff, lines_added, lines_removed FROM diff_cache
+               WHERE original_hash IS ? AND proposed_hash = ? AND file_path = ? AND context_lines = ?""",
+            (original_hash, proposed_hash, file_path, context_lines)
+        ).fetchone()
+    if row:
+        return dict(row)
+
+    bodies = get_blobs([original_hash, proposed_hash])
+    diff = unified_diff(bodies.get(original_hash, ""), bodies.get(proposed_hash, ""), file_path, context_lines)
+    return _store_diff(original_hash, proposed_hash, file_path, context_lines, diff)
+
+
+def attach_diffs(changes: List[Dict], context_lines: int = DEFAULT_DIFF_CONTEXT) -> List[Dict]:
+    """Add a unified ``diff`` (plus line counts) to each proposed change."""
+    for change in changes:
+        change.update(get_diff(
+            change['original_hash'], change['proposed_hash'], change['file_path'], context_lines
+        ))
     return changes
 
 
+def get_proposed_change(change_id: int, include_content: bool = True) -> Optional[Dict]:
+    """Get a proposed change by ID, with file bodies unless include_content is False."""
+    with connection() as conn:
+        row = conn.execute(
+            f"SELECT {PROPOSED_CHANGE_COLUMNS} {PROPOSED_CHANGE_FROM} WHERE pc.id = ?", (change_id,)
+        ).fetchone()
+    if not row:
+        return None
+
+    change = dict(row)
+    if include_content:
+        _hydrate_proposed_changes([change])
+    return change
+
+
+PROPOSED_FOR_TICKET_QUERY = (
+    f"SELECT {PROPOSED_CHANGE_COLUMNS} {PROPOSED_CHANGE_FROM} "
+    "WHERE pc.ticket_id = ? ORDER BY pc.created_at DESC"
+)
+PENDING_PROPOSED_QUERY = (
+    f"SELECT {PROPOSED_CHANGE_COLUMNS} {PROPOSED_CHANGE_FROM} "
+    "WHERE pc.status = 'pending' ORDER BY pc.created_at DESC"
+)
+
+
+def get_proposed_changes_for_ticket(ticket_id: int, include_content: bool = False) -> List[Dict]:
+    """Get all proposed changes for a ticket (metadata only unless include_content)."""
+    with connection() as conn:
+        changes = [dict(row) for row in conn.execute(PROPOSED_FOR_TICKET_QUERY, (ticket_id,)).fetchall()]
+    return _hydrate_proposed_changes(changes) if include_content else changes
+
+
+def get_pending_changes_for_ticket(ticket_id: int) -> List[Dict]:
+    """Get a ticket's pending proposed changes with file bodies, oldest first."""
+    with connection() as conn:
+        changes = [dict(row) for row in conn.execute(
+            f"SELECT {PROPOSED_CHANGE_COLUMNS} {PROPOSED_CHANGE_FROM} "
+            "WHERE pc.ticket_id = ? AND pc.status = 'pending' ORDER BY pc.created_at, pc.id",
+            (ticket_id,)
+        ).fetchall()]
+    return _hydrate_proposed_changes(changes)
+
+
+def get_pending_proposed_changes(include_content: bool = False) -> List[Dict]:
+    """Get all pending proposed changes (metadata only unless include_content)."""
+    with connection() as conn:
+        changes = [dict(row) for row in conn.execute(PENDING_PROPOSED_QUERY).fetchall()]
+    return _hydrate_proposed_changes(changes) if include_content else changes
+
+
 def update_proposed_change_status(change_id: int, status: str) -> bool:
     """Update proposed change status (accepted/rejected)."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """UPDATE proposed_changes
-           SET status = ?, resolved_at = ?
-           WHERE id = ?""",
-        (status, datetime.now(), change_id)
-    )
-    conn.commit()
-    success = cursor.rowcount > 0
-    conn.close()
-    return success
+    with transaction() as conn:
+        cursor = conn.execute(
+            """UPDATE proposed_changes
+               SET status = ?, resolved_at = ?
+               WHERE id = ?""",
+            (status, datetime.now(), change_id)
+        )
+        return cursor.rowcount > 0
+
+
+def accept_proposed_changes(
+    ticket_id: int,
+    applied_changes: List[Dict],
+    project_id: Optional[int] = None
+) -> int:
+    """
+    Mark applied changes accepted, record them in history and resolve the
+    ticket, all in a single transaction. Only changes still pending are
+    marked and recorded, and the ticket is only resolved if at least one
+    was; returns how many were.
+    """
+    now = datetime.now()
+    with transaction() as conn:
+        accepted = []
+        for change in applied_changes:
+            cursor = conn.execute(
+                "UPDATE proposed_changes SET status = 'accepted', resolved_at = ? WHERE id = ? AND status = 'pending'",
+                (now, change['id'])
+            )
+            if cursor.rowcount:
+                accepted.append(change)
+        conn.executemany(
+            """INSERT INTO changes_history
+               (project_id, ticket_id, files_affected, change_type, change_summary, ai_response)
+               VALUES (?, ?, ?, 'modify', ?, ?)""",
+            [
+                (
+                    project_id,
+                    ticket_id,
+                    json.dumps([change['file_path']]),
+                    (change.get('change_description') or '')[:200],
+                    (change.get('proposed_content') or '')[:500]
+                )
+                for change in accepted
+            ]
+        )
+        if accepted:
+            update_ticket_ai_status(ticket_id, 'accepted')
+    return len(accepted)
 
 
 def seed_default_project():
@@ -309,35 +1075,25 @@ def create_project(
     backend_url: Optional[str] = None
 ) -> int:
     """Create a new project."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO projects (title, path, description, frontend_url, backend_url) VALUES (?, ?, ?, ?, ?)",
-        (title, path, description, frontend_url, backend_url)
-    )
-    conn.commit()
-    project_id = cursor.lastrowid
-    conn.close()
-    return project_id
+    with transaction() as conn:
+        cursor = conn.execute(
+            "INSERT INTO projects (title, path, description, frontend_url, backend_url) VALUES (?, ?, ?, ?, ?)",
+            (title, path, description, frontend_url, backend_url)
+        )
+        return cursor.lastrowid
 
 
 def get_projects() -> List[Dict]:
     """Get all projects."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM projects ORDER BY updated_at DESC")
-    projects = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return projects
+    with connection() as conn:
+        cursor = conn.execute("SELECT * FROM projects ORDER BY updated_at DESC")
+        return [dict(row) for row in cursor.fetchall()]
 
 
 def get_project_by_id(project_id: int) -> Optional[Dict]:
     """Get project by ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM projects WHERE id = ?", (project_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with connection() as conn:
+        row = conn.execute("SELECT * FROM projects WHERE id = ?", (project_id,)).fetchone()
     return dict(row) if row else None
 
 
@@ -354,24 +1110,24 @@ def create_ticket(
     priority: str = "medium"
 ) -> int:
     """Create a new ticket."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """INSERT INTO tickets (title, description, category, creator_id, project_id, priority)
-           VALUES (?, ?, ?, ?, ?, ?)""",
-        (title, description, category, creator_id, project_id, priority)
-    )
-    conn.commit()
-    ticket_id = cursor.lastrowid
-    conn.close()
-    return ticket_id
-
+    with transaction() as conn:
+        cursor = conn.execute(
+            """INSERT INTO tickets (title, description, category, creator_id, project_id, priority)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (title, description, category, creator_id, project_id, priority)
+        )
+        return cursor.lastrowid
 
-def get_tickets(project_id: Optional[int] = None, status: Optional[str] = None) -> List[Dict]:
-    """Get tickets with optional filters."""
-    conn = get_connection()
-    cursor = conn.cursor()
 
+def _tickets_query(
+    project_id: Optional[int] = None,
+    status: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    file_path: Optional[str] = None,
+    category: Optional[str] = None
+):
+    """Build the ticket list query and its parameters."""
     query = """
         SELECT t.*, p.title as project_title
         FROM tickets t
@@ -386,48 +1142,57 @@ def get_tickets(project_id: Optional[int] = None, status: Optional[str] = None)
     if status:
         query += " AND t.status = ?"
         params.append(status)
+    if category:
+        query += " AND t.category = ?"
+        params.append(category)
+    if file_path:
+        query += " AND t.id IN (SELECT ticket_id FROM ticket_files WHERE file_path = ?)"
+        params.append(file_path)
 
-    query += " ORDER BY t.created_at DESC"
-    cursor.execute(query, params)
-    tickets = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return tickets
+    return _apply_keyset(query, params, "t", limit, cursor)
+
+
+def get_tickets(
+    project_id: Optional[int] = None,
+    status: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    file_path: Optional[str] = None,
+    category: Optional[str] = None
+) -> List[Dict]:
+    """Get tickets with optional filters, newest first, starting after ``cursor``."""
+    query, params = _tickets_query(project_id, status, limit, cursor, file_path, category)
+    with connection() as conn:
+        return [dict(row) for row in conn.execute(query, params).fetchall()]
 
 
 def update_ticket_status(ticket_id: int, status: str) -> bool:
     """Update ticket status."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE tickets SET status = ?, updated_at = ? WHERE id = ?",
-        (status, datetime.now(), ticket_id)
-    )
-    conn.commit()
-    success = cursor.rowcount > 0
-    conn.close()
-    return success
+    with transaction() as conn:
+        cursor = conn.execute(
+            "UPDATE tickets SET status = ?, updated_at = ? WHERE id = ?",
+            (status, datetime.now(), ticket_id)
+        )
+        return cursor.rowcount > 0
 
 
 def get_ticket_by_id(ticket_id: int) -> Optional[Dict]:
     """Get a single ticket with creator and assignee info."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT
-            t.*,
-            creator.username as creator_username,
-            creator.role as creator_role,
-            assignee.username as assignee_username,
-            assignee.role as assignee_role,
-            p.title as project_title
-        FROM tickets t
-        LEFT JOIN users creator ON t.creator_id = creator.id
-        LEFT JOIN users assignee ON t.assignee_id = assignee.id
-        LEFT JOIN projects p ON t.project_id = p.id
-        WHERE t.id = ?
-    """, (ticket_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with connection() as conn:
+        row = conn.execute("""
+            SELECT
+                t.*,
+                creator.username as creator_username,
+                creator.role as creator_role,
+                assignee.username as assignee_username,
+                assignee.role as assignee_role,
+                p.title as project_title
+            FROM tickets t
+            LEFT JOIN users creator ON t.creator_id = creator.id
+            LEFT JOIN users assignee ON t.assignee_id = assignee.id
+            LEFT JOIN projects p ON t.project_id = p.id
+            WHERE t.id = ?
+        """, (ticket_id,)).fetchone()
 
     if row:
         ticket = dict(row)
@@ -440,45 +1205,35 @@ def get_ticket_by_id(ticket_id: int) -> Optional[Dict]:
 
 def update_ticket_ai_suggestion(ticket_id: int, suggestion: str, files_analyzed: List[str]) -> bool:
     """Store AI suggestion for a ticket."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """UPDATE tickets
-           SET ai_suggestion = ?, ai_files_analyzed = ?, ai_suggestion_status = 'pending', updated_at = ?
-           WHERE id = ?""",
-        (suggestion, json.dumps(files_analyzed), datetime.now(), ticket_id)
-    )
-    conn.commit()
-    success = cursor.rowcount > 0
-    conn.close()
-    return success
-
-
-def update_ticket_ai_status(ticket_id: int, status: str) -> bool:
-    """Update AI suggestion status (accepted/rejected)."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # If accepted, also resolve the ticket
-    if status == 'accepted':
-        cursor.execute(
+    with transaction() as conn:
+        cursor = conn.execute(
             """UPDATE tickets
-               SET ai_suggestion_status = ?, status = 'resolved', updated_at = ?
+               SET ai_suggestion = ?, ai_files_analyzed = ?, ai_suggestion_status = 'pending', updated_at = ?
                WHERE id = ?""",
-            (status, datetime.now(), ticket_id)
-        )
-    else:
-        cursor.execute(
-            """UPDATE tickets
-               SET ai_suggestion_status = ?, updated_at = ?
-               WHERE id = ?""",
-            (status, datetime.now(), ticket_id)
+            (suggestion, json.dumps(files_analyzed), datetime.now(), ticket_id)
         )
+        return cursor.rowcount > 0
 
-    conn.commit()
-    success = cursor.rowcount > 0
-    conn.close()
-    return success
+
+def update_ticket_ai_status(ticket_id: int, status: str) -> bool:
+    """Update AI suggestion status (accepted/rejected)."""
+    with transaction() as conn:
+        # If accepted, also resolve the ticket
+        if status == 'accepted':
+            cursor = conn.execute(
+                """UPDATE tickets
+                   SET ai_suggestion_status = ?, status = 'resolved', updated_at = ?
+                   WHERE id = ?""",
+                (status, datetime.now(), ticket_id)
+            )
+        else:
+            cursor = conn.execute(
+                """UPDATE tickets
+                   SET ai_suggestion_status = ?, updated_at = ?
+                   WHERE id = ?""",
+                (status, datetime.now(), ticket_id)
+            )
+        return cursor.rowcount > 0
 
 
 # =============================================================================
@@ -495,46 +1250,285 @@ def record_change(
     user_id: Optional[int] = None
 ) -> int:
     """Record a change in history."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """INSERT INTO changes_history
-           (project_id, ticket_id, files_affected, change_type, change_summary, ai_response, user_id)
-           VALUES (?, ?, ?, ?, ?, ?, ?)""",
-        (project_id, ticket_id, json.dumps(files_affected), change_type, change_summary, ai_response, user_id)
-    )
-    conn.commit()
-    change_id = cursor.lastrowid
-    conn.close()
-    return change_id
+    with transaction() as conn:
+        cursor = conn.execute(
+            """INSERT INTO changes_history
+               (project_id, ticket_id, files_affected, change_type, change_summary, ai_response, user_id)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (project_id, ticket_id, json.dumps(files_affected), change_type, change_summary, ai_response, user_id)
+        )
+        return cursor.lastrowid
 
 
-def get_changes_history(project_id: Optional[int] = None, limit: int = 50) -> List[Dict]:
-    """Get changes history with optional project filter."""
-    conn = get_connection()
-    cursor = conn.cursor()
+def _changes_history_query(
+    project_id: Optional[int] = None,
+    limit: Optional[int] = 50,
+    cursor: Optional[str] = None,
+    file_path: Optional[str] = None
+):
+    """Build the changes history query and its parameters."""
+    query = "SELECT * FROM changes_history WHERE 1=1"
+    params = []
 
     if project_id:
-        cursor.execute(
-            "SELECT * FROM changes_history WHERE project_id = ? ORDER BY created_at DESC LIMIT ?",
-            (project_id, limit)
-        )
-    else:
-        cursor.execute(
-            "SELECT * FROM changes_history ORDER BY created_at DESC LIMIT ?",
-            (limit,)
+        query += " AND project_id = ?"
+        params.append(project_id)
+    if file_path:
+        query += " AND id IN (SELECT change_id FROM change_files WHERE file_path = ?)"
+        params.append(file_path)
+
+    return _apply_keyset(query, params, "", limit, cursor)
+
+
+def record_changes(rows: List[Dict]) -> int:
+    """Insert several change history rows with one executemany in one transaction."""
+    with transaction() as conn:
+        conn.executemany(
+            """INSERT INTO changes_history
+               (project_id, ticket_id, files_affected, change_type, change_summary, ai_response, user_id)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            [
+                (
+                    row.get('project_id'),
+                    row.get('ticket_id'),
+                    json.dumps(row['files_affected']),
+                    row['change_type'],
+                    row['change_summary'],
+                    row.get('ai_response'),
+                    row.get('user_id')
+                )
+                for row in rows
+            ]
         )
+    return len(rows)
+
+
+def get_changes_history(
+    project_id: Optional[int] = None,
+    limit: Optional[int] = 50,
+    cursor: Optional[str] = None,
+    file_path: Optional[str] = None
+) -> List[Dict]:
+    """Get changes history with optional project/file filters, starting after ``cursor``."""
+    query, params = _changes_history_query(project_id, limit, cursor, file_path)
+    with connection() as conn:
+        rows = conn.execute(query, params).fetchall()
 
     changes = []
-    for row in cursor.fetchall():
+    for row in rows:
         change = dict(row)
         change['files_affected'] = json.loads(change['files_affected']) if change['files_affected'] else []
         changes.append(change)
-
-    conn.close()
     return changes
 
 
+# =============================================================================
+# LLM USAGE OPERATIONS
+# =============================================================================
+
+USAGE_FIELDS = ["input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"]
+
+
+def record_llm_usage(rows: List[Dict]) -> int:
+    """Insert token usage rows (one per model call) in one transaction."""
+    with transaction() as conn:
+        conn.executemany(
+            f"""INSERT INTO llm_usage (purpose, model, {', '.join(USAGE_FIELDS)})
+                VALUES (?, ?, {', '.join('?' for _ in USAGE_FIELDS)})""",
+            [
+                (row['purpose'], row.get('model'), *(row.get(field) or 0 for field in USAGE_FIELDS))
+                for row in rows
+            ]
+        )
+    return len(rows)
+
+
+def get_llm_usage_summary() -> List[Dict]:
+    """Total calls and tokens per purpose."""
+    totals = ", ".join(f"SUM({field}) AS {field}" for field in USAGE_FIELDS)
+    with connection() as conn:
+        rows = conn.execute(
+            f"SELECT purpose, COUNT(*) AS calls, {totals} FROM llm_usage GROUP BY purpose ORDER BY purpose"
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+# =============================================================================
+# LLM RESPONSE CACHE OPERATIONS
+# =============================================================================
+
+def get_cached_response(cache_key: str, ttl_seconds: int) -> Optional[Tuple[str, float]]:
+    """
+    Return (reply, age in seconds) for a cached model reply younger than
+    ttl_seconds, bumping its LRU stamp.
+
+    The lookup is a plain read; a write transaction is only opened to count
+    a hit or to delete the row once it has expired.
+    """
+    age = f"-{ttl_seconds} seconds"
+    with connection() as conn:
+        row = conn.execute(
+            """SELECT response, created_at > datetime('now', ?) AS fresh,
+                      (julianday('now') - julianday(created_at)) * 86400 AS age
+               FROM llm_response_cache WHERE cache_key = ?""",
+            (age, cache_key)
+        ).fetchone()
+    if row is None:
+        return None
+
+    with transaction() as conn:
+        if not row['fresh']:
+            conn.execute(
+                "DELETE FROM llm_response_cache WHERE cache_key = ? AND created_at <= datetime('now', ?)",
+                (cache_key, age)
+            )
+            return None
+        conn.execute(
+            """UPDATE llm_response_cache SET hits = hits + 1, last_used_at = CURRENT_TIMESTAMP
+               WHERE cache_key = ?""",
+            (cache_key,)
+        )
+    return row['response'], max(0.0, row['age'])
+
+
+def store_cached_response(cache_key: str, response: str, purpose: Optional[str] = None, model: Optional[str] = None):
+    """Insert or refresh a cached model reply."""
+    with transaction() as conn:
+        conn.execute(
+            """INSERT OR REPLACE INTO llm_response_cache (cache_key, purpose, model, response)
+               VALUES (?, ?, ?, ?)""",
+            (cache_key, purpose, model, response)
+        )
+
+
+def prune_response_cache(ttl_seconds: int, max_entries: int) -> int:
+    """Drop expired replies, then the least recently used beyond max_entries."""
+    with transaction() as conn:
+        expired = conn.execute(
+            "DELETE FROM llm_response_cache WHERE created_at <= datetime('now', ?)",
+            (f"-{ttl_seconds} seconds",)
+        ).rowcount
+        overflow = conn.execute(
+            """DELETE FROM llm_response_cache WHERE cache_key IN (
+                   SELECT cache_key FROM llm_response_cache
+                   ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+               )""",
+            (max_entries,)
+        ).rowcount
+    return expired + overflow
+
+
+def clear_response_cache() -> int:
+    """Delete every cached model reply."""
+    with transaction() as conn:
+        return conn.execute("DELETE FROM llm_response_cache").rowcount
+
+
+# =============================================================================
+# CONVERSATION OPERATIONS
+# =============================================================================
+
+def get_conversation_messages(conversation_key: str, limit: int) -> List[Dict]:
+    """Return the most recent ``limit`` messages of a conversation, oldest first."""
+    with connection() as conn:
+        rows = conn.execute(
+            """SELECT role, content FROM (
+                   SELECT id, role, content FROM conversation_messages
+                   WHERE conversation_key = ? ORDER BY id DESC LIMIT ?
+               ) ORDER BY id""",
+            (conversation_key, limit)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def append_conversation_messages(conversation_key: str, messages: List[Dict], keep: int) -> int:
+    """Append messages to a conversation and drop all but its latest ``keep``."""
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT INTO conversation_messages (conversation_key, role, content) VALUES (?, ?, ?)",
+            [(conversation_key, message['role'], message['content']) for message in messages]
+        )
+        conn.execute(
+            """DELETE FROM conversation_messages WHERE conversation_key = ? AND id NOT IN (
+                   SELECT id FROM conversation_messages
+                   WHERE conversation_key = ? ORDER BY id DESC LIMIT ?
+               )""",
+            (conversation_key, conversation_key, keep)
+        )
+    return len(messages)
+
+
+def get_conversation_summary(conversation_key: str) -> Optional[str]:
+    """Return the rolling summary of a conversation's compacted turns, if any."""
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT summary FROM conversation_summaries WHERE conversation_key = ?", (conversation_key,)
+        ).fetchone()
+    return row['summary'] if row else None
+
+
+def replace_conversation(conversation_key: str, summary: str, messages: List[Dict]):
+    """Store a compacted conversation: its new summary and the messages kept verbatim."""
+    with transaction() as conn:
+        conn.execute("DELETE FROM conversation_messages WHERE conversation_key = ?", (conversation_key,))
+        conn.executemany(
+            "INSERT INTO conversation_messages (conversation_key, role, content) VALUES (?, ?, ?)",
+            [(conversation_key, message['role'], message['content']) for message in messages]
+        )
+        conn.execute(
+            """INSERT INTO conversation_summaries (conversation_key, summary) VALUES (?, ?)
+               ON CONFLICT(conversation_key) DO UPDATE SET
+                   summary = excluded.summary, updated_at = CURRENT_TIMESTAMP""",
+            (conversation_key, summary)
+        )
+
+
+def delete_conversation(conversation_key: str) -> int:
+    """Delete every stored message (and the summary) of a conversation."""
+    with transaction() as conn:
+        conn.execute("DELETE FROM conversation_summaries WHERE conversation_key = ?", (conversation_key,))
+        return conn.execute(
+            "DELETE FROM conversation_messages WHERE conversation_key = ?", (conversation_key,)
+        ).rowcount
+
+
+# =============================================================================
+# FILE INDEX OPERATIONS
+# =============================================================================
+
+FILE_INDEX_FIELDS = ["path", "size", "mtime", "content_hash", "extension"]
+
+
+def get_file_index_entries(root: str) -> List[Dict]:
+    """Return every indexed file under a project root."""
+    with connection() as conn:
+        rows = conn.execute(
+            f"SELECT {', '.join(FILE_INDEX_FIELDS)} FROM file_index WHERE root = ? ORDER BY path", (root,)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def update_file_index(root: str, upserts: List[Dict], deletes: List[str]) -> int:
+    """Insert or refresh changed files and drop deleted ones, in one transaction."""
+    with transaction() as conn:
+        conn.executemany(
+            """INSERT INTO file_index (root, path, size, mtime, content_hash, extension)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(root, path) DO UPDATE SET
+                   size = excluded.size, mtime = excluded.mtime, content_hash = excluded.content_hash,
+                   extension = excluded.extension, indexed_at = CURRENT_TIMESTAMP""",
+            [(root, *(entry[field] for field in FILE_INDEX_FIELDS)) for entry in upserts]
+        )
+        conn.executemany("DELETE FROM file_index WHERE root = ? AND path = ?", [(root, path) for path in deletes])
+    return len(upserts) + len(deletes)
+
+
+def clear_file_index(root: str) -> int:
+    """Forget every indexed file under a project root."""
+    with transaction() as conn:
+        return conn.execute("DELETE FROM file_index WHERE root = ?", (root,)).rowcount
+
+
 # =============================================================================
 # AI CONTEXT OPERATIONS
 # =============================================================================
@@ -547,24 +1541,43 @@ def save_ai_context(
     tags: Optional[List[str]] = None
 ) -> int:
     """Save AI context/finding."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """INSERT INTO ai_context (project_id, context_type, title, content, tags)
-           VALUES (?, ?, ?, ?, ?)""",
-        (project_id, context_type, title, content, json.dumps(tags) if tags else None)
-    )
-    conn.commit()
-    context_id = cursor.lastrowid
-    conn.close()
-    return context_id
-
+    with transaction() as conn:
+        cursor = conn.execute(
+            """INSERT INTO ai_context (project_id, context_type, title, content, tags)
+               VALUES (?, ?, ?, ?, ?)""",
+            (project_id, context_type, title, content, json.dumps(tags) if tags else None)
+        )
+        return cursor.lastrowid
+
+
+def save_ai_contexts(rows: List[Dict]) -> int:
+    """Insert several AI context rows with one executemany in one transaction."""
+    with transaction() as conn:
+        conn.executemany(
+            """INSERT INTO ai_context (project_id, context_type, title, content, tags)
+               VALUES (?, ?, ?, ?, ?)""",
+            [
+                (
+                    row.get('project_id'),
+                    row.get('context_type', 'finding'),
+                    row.get('title'),
+                    row['content'],
+                    json.dumps(row['tags']) if row.get('tags') else None
+                )
+                for row in rows
+            ]
+        )
+    return len(rows)
 
-def get_ai_context(project_id: Optional[int] = None, context_type: Optional[str] = None) -> List[Dict]:
-    """Get AI context entries."""
-    conn = get_connection()
-    cursor = conn.cursor()
 
+def _ai_context_query(
+    project_id: Optional[int] = None,
+    context_type: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    tag: Optional[str] = None
+):
+    """Build the AI context list query and its parameters."""
     query = "SELECT * FROM ai_context WHERE 1=1"
     params = []
 
@@ -574,20 +1587,185 @@ def get_ai_context(project_id: Optional[int] = None, context_type: Optional[str]
     if context_type:
         query += " AND context_type = ?"
         params.append(context_type)
+    if tag:
+        query += " AND id IN (SELECT context_id FROM context_tags WHERE tag = ?)"
+        params.append(tag)
 
-    query += " ORDER BY created_at DESC"
-    cursor.execute(query, params)
+    return _apply_keyset(query, params, "", limit, cursor)
+
+
+def get_ai_context(
+    project_id: Optional[int] = None,
+    context_type: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    tag: Optional[str] = None
+) -> List[Dict]:
+    """Get AI context entries, newest first, starting after ``cursor``."""
+    query, params = _ai_context_query(project_id, context_type, limit, cursor, tag)
+    with connection() as conn:
+        rows = conn.execute(query, params).fetchall()
 
     contexts = []
-    for row in cursor.fetchall():
+    for row in rows:
         ctx = dict(row)
         ctx['tags'] = json.loads(ctx['tags']) if ctx['tags'] else []
         contexts.append(ctx)
-
-    conn.close()
     return contexts
 
 
+def get_ai_context_entries(context_ids: List[int]) -> List[Dict]:
+    """Fetch AI context entries by id, in the order given."""
+    if not context_ids:
+        return []
+    placeholders = ", ".join("?" for _ in context_ids)
+    with connection() as conn:
+        rows = conn.execute(f"SELECT * FROM ai_context WHERE id IN ({placeholders})", context_ids).fetchall()
+
+    by_id = {}
+    for row in rows:
+        ctx = dict(row)
+        ctx['tags'] = json.loads(ctx['tags']) if ctx['tags'] else []
+        by_id[ctx['id']] = ctx
+    return [by_id[context_id] for context_id in context_ids if context_id in by_id]
+
+
+# =============================================================================
+# SEARCH OPERATIONS
+# =============================================================================
+
+def _fts_match_expression(text: str) -> str:
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    Every word is quoted (so user input never hits FTS syntax) and the
+    last word is a prefix match, for search-as-you-type.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search(
+    text: str,
+    types: Optional[List[str]] = None,
+    project_id: Optional[int] = None,
+    limit: int = 20,
+    offset: int = 0
+) -> List[Dict]:
+    """
+    Ranked full-text search across tickets, AI context and change history.
+
+    Returns up to ``limit`` hits ordered by BM25 relevance, each with its
+    type, id, title, a highlighted snippet and created_at.
+    """
+    match = _fts_match_expression(text)
+    if not match:
+        return []
+
+    title_sql = {"ticket": "src.title", "context": "src.title", "change": "src.change_summary"}
+    selects = []
+    params = []
+    for result_type, (table, columns, weights) in SEARCH_SOURCES.items():
+        if types and result_type not in types:
+            continue
+        fts = f"{table}_fts"
+        query = f"""
+            SELECT '{result_type}' AS type, src.id AS id, {title_sql[result_type]} AS title,
+                   snippet({fts}, -1, '[', ']', '...', 16) AS snippet,
+                   bm25({fts}, {", ".join(str(w) for w in weights)}) AS rank,
+                   src.created_at AS created_at
+            FROM {fts}
+            JOIN {table} src ON src.id = {fts}.rowid
+            WHERE {fts} MATCH ?
+        """
+        params.append(match)
+        if project_id:
+            query += " AND src.project_id = ?"
+            params.append(project_id)
+        selects.append(query)
+
+    if not selects:
+        return []
+
+    query = " UNION ALL ".join(selects) + " ORDER BY rank LIMIT ? OFFSET ?"
+    params.extend([limit, offset])
+    with connection() as conn:
+        return [dict(row) for row in conn.execute(query, params).fetchall()]
+
+
+def _hot_queries() -> Dict:
+    """The list queries the dashboard hits most, with sample parameters."""
+    return {
+        "get_tickets": _tickets_query(),
+        "get_tickets(project)": _tickets_query(project_id=1),
+        "get_tickets(status)": _tickets_query(status='open'),
+        "get_tickets(project, status)": _tickets_query(project_id=1, status='open'),
+        "get_tickets(category)": _tickets_query(category='bug', limit=51),
+        "get_tickets(page)": _tickets_query(limit=51, cursor=encode_cursor({"created_at": "", "id": 0})),
+        "get_proposed_changes_for_ticket": (PROPOSED_FOR_TICKET_QUERY, [1]),
+        "get_pending_proposed_changes": (PENDING_PROPOSED_QUERY, []),
+        "get_changes_history": _changes_history_query(),
+        "get_changes_history(project)": _changes_history_query(project_id=1),
+        "get_ai_context": _ai_context_query(),
+        "get_ai_context(project)": _ai_context_query(project_id=1),
+        "get_ai_context(type)": _ai_context_query(context_type='finding'),
+        "get_ai_context(project, type)": _ai_context_query(project_id=1, context_type='finding'),
+        "get_ai_context(page)": _ai_context_query(limit=51, cursor=encode_cursor({"created_at": "", "id": 0})),
+    }
+
+
+# =============================================================================
+# DASHBOARD OPERATIONS
+# =============================================================================
+
+def _acceptance_rate(counts: Dict) -> Optional[float]:
+    decided = counts.get('accepted', 0) + counts.get('rejected', 0)
+    return round(counts.get('accepted', 0) / decided, 4) if decided else None
+
+
+def get_dashboard_summary() -> Dict:
+    """Ticket and proposal counts from the materialized counter tables."""
+    with connection() as conn:
+        ticket_rows = conn.execute("SELECT dimension, value, count FROM ticket_stats WHERE count != 0").fetchall()
+        change_rows = conn.execute("SELECT status, count FROM proposed_change_stats WHERE count != 0").fetchall()
+
+    by_dimension = {dim: {} for dim in TICKET_STAT_DIMENSIONS}
+    for row in ticket_rows:
+        by_dimension[row['dimension']][row['value']] = row['count']
+    change_counts = {row['status']: row['count'] for row in change_rows}
+    ai_status = by_dimension['ai_suggestion_status']
+
+    return {
+        "tickets": {
+            "total": sum(by_dimension['status'].values()),
+            "by_status": by_dimension['status'],
+            "by_priority": by_dimension['priority'],
+            "by_category": by_dimension['category'],
+            "by_ai_suggestion_status": ai_status
+        },
+        "proposed_changes": {
+            "total": sum(change_counts.values()),
+            "pending": change_counts.get('pending', 0),
+            "by_status": change_counts
+        },
+        "ai_acceptance_rate": _acceptance_rate(ai_status),
+        "change_acceptance_rate": _acceptance_rate(change_counts)
+    }
+
+
+def get_file_activity(file_path: str, limit: int = 50) -> Dict:
+    """Tickets and history entries that touched a file, via the link-table indexes."""
+    return {
+        "file_path": file_path,
+        "tickets": get_tickets(limit=limit, file_path=file_path),
+        "changes": get_changes_history(limit=limit, file_path=file_path)
+    }
+
+
 def export_ai_context_to_file(filepath: str, project_id: Optional[int] = None) -> str:
     """Export all AI context to a markdown file."""
     contexts = get_ai_context(project_id)
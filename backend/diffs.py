@@ -0,0 +1,129 @@
+"""
+Diff utilities for proposed changes.
+
+Builds unified diffs between an original file and a proposed version so
+the API can ship the size of the change instead of two full file bodies,
+and applies SEARCH/REPLACE edit blocks returned by the model so it only
+has to write the lines it changes.
+"""
+
+import difflib
+import re
+from typing import List, Tuple
+
+# <<<<<<< SEARCH / ======= / >>>>>>> REPLACE blocks (the markers on their own lines)
+EDIT_BLOCK_PATTERN = re.compile(
+    r"^<{5,9} SEARCH[^\n]*\n(.*?)^={5,9}[ \t]*\n(.*?)^>{5,9} REPLACE[^\n]*$",
+    re.MULTILINE | re.DOTALL
+)
+
+EDIT_BLOCK_FORMAT = """Describe each change as a SEARCH/REPLACE block:
+
+<<<<<<< SEARCH
+exact lines copied from the current file
+=======
+the lines that replace them
+>>>>>>> REPLACE
+
+Rules:
+- SEARCH must match the current file exactly (including indentation) and only once;
+  include a few surrounding lines if needed to make it unique.
+- Use one block per separate change, in file order. Keep blocks small.
+- To add code, SEARCH for the lines next to where it goes and repeat them in REPLACE.
+- Return only the blocks, with no explanations or markdown code fences."""
+
+
+class EditApplyError(ValueError):
+    """Edit blocks could not be parsed or applied to the original content."""
+
+
+def unified_diff(original: str, proposed: str, file_path: str = "", context_lines: int = 3) -> str:
+    """Return a unified diff of original -> proposed with the given context size."""
+    diff = difflib.unified_diff(
+        (original or "").splitlines(keepends=True),
+        (proposed or "").splitlines(keepends=True),
+        fromfile=f"a/{file_path}",
+        tofile=f"b/{file_path}",
+        n=context_lines
+    )
+
+    lines = []
+    for line in diff:
+        if not line.endswith("\n"):
+            # Mirror git's marker for a last line without a newline
+            line += "\n\\ No newline at end of file\n"
+        lines.append(line)
+    return "".join(lines)
+
+
+def diff_stats(diff: str) -> Tuple[int, int]:
+    """Count (lines_added, lines_removed) in a unified diff."""
+    added = removed = 0
+    for line in diff.splitlines():
+        if line.startswith("+") and not line.startswith("+++"):
+            added += 1
+        elif line.startswith("-") and not line.startswith("---"):
+            removed += 1
+    return added, removed
+
+
+def parse_edit_blocks(text: str) -> List[Tuple[str, str]]:
+    """Extract (search, replace) pairs from a model reply, in order."""
+    return [(search, replace) for search, replace in EDIT_BLOCK_PATTERN.findall(text or "")]
+
+
+def _find_loose(content: str, search: str) -> Tuple[int, int]:
+    """Locate search in content ignoring trailing whitespace per line; (start, end) or (-1, -1)."""
+    lines = content.splitlines(keepends=True)
+    wanted = [line.rstrip() for line in search.splitlines()]
+    if not wanted:
+        return -1, -1
+
+    matches = []
+    for i in range(len(lines) - len(wanted) + 1):
+        if all(lines[i + j].rstrip() == wanted[j] for j in range(len(wanted))):
+            matches.append(i)
+    if len(matches) != 1:
+        return -1, len(matches)
+
+    start = sum(len(line) for line in lines[:matches[0]])
+    end = start + sum(len(line) for line in lines[matches[0]:matches[0] + len(wanted)])
+    return start, end
+
+
+def apply_edit_blocks(original: str, blocks: List[Tuple[str, str]]) -> str:
+    """
+    Apply SEARCH/REPLACE blocks to original, in order.
+
+    Each SEARCH must occur exactly once (exactly, or else ignoring trailing
+    whitespace). An empty SEARCH appends REPLACE to the end of the file.
+    Raises EditApplyError if any block doesn't apply.
+    """
+    if not blocks:
+        raise EditApplyError("No edit blocks found in the response")
+
+    content = original or ""
+    for number, (search, replace) in enumerate(blocks, 1):
+        if not search.strip():
+            if content and not content.endswith("\n"):
+                content += "\n"
+            content += replace
+            continue
+
+        count = content.count(search)
+        if count == 1:
+            content = content.replace(search, replace, 1)
+            continue
+
+        start, end = _find_loose(content, search)
+        if start < 0:
+            matches = count or end
+            problem = "matches more than one place" if matches > 1 else "does not match the file"
+            raise EditApplyError(f"Edit block {number} {problem}")
+
+        # Keep the file's own line ending after the replaced span
+        if content[start:end].endswith("\n") and not replace.endswith("\n") and replace:
+            replace += "\n"
+        content = content[:start] + replace + content[end:]
+
+    return content
@@ -0,0 +1,210 @@
+"""
+Persistent index of the target project's files.
+
+Listing the project used to mean an rglob over everything (node_modules,
+.git and venv included) on every task and route scan. This lists files
+with the shared walker (which prunes skipped, hidden and .gitignore'd
+directories before descending) and keeps path, size, mtime, content hash
+and extension in the file_index table. A refresh re-hashes only the files whose mtime or size
+changed, and runs at most every FILE_INDEX_REFRESH_INTERVAL seconds; while
+the file watcher is running, changes arrive through apply_change instead.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from . import database as db
+from .config import (
+    TARGET_PROJECT_DIR,
+    ALLOWED_EXTENSIONS,
+    MAX_FILE_SIZE,
+    FILE_INDEX_REFRESH_INTERVAL,
+    FILE_INDEX_SKIP_DIRS,
+    FILE_INDEX_USE_GIT
+)
+from .walker import Walker
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(path: Path) -> Optional[str]:
+    """SHA-256 of a file's bytes (None if it is too large to process or unreadable)."""
+    try:
+        if path.stat().st_size > MAX_FILE_SIZE:
+            return None
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+# (relative path, deleted) pairs describing what an update changed
+Changes = List[Tuple[str, bool]]
+
+
+class FileIndex:
+    """The files of one project root, mirrored in memory and in SQLite.
+
+    While ``watched`` is set (a file watcher is feeding apply_change), queries
+    don't re-walk the project; only the first load and forced refreshes do.
+    """
+
+    def __init__(self, root: Path = TARGET_PROJECT_DIR, refresh_interval: float = FILE_INDEX_REFRESH_INTERVAL):
+        self.root = Path(root)
+        self.walker = Walker(self.root, ALLOWED_EXTENSIONS, FILE_INDEX_SKIP_DIRS, use_git=FILE_INDEX_USE_GIT)
+        self.refresh_interval = refresh_interval
+        self.watched = False
+        self._entries: Optional[Dict[str, Dict]] = None  # path -> row, loaded lazily
+        self._refreshed_at: Optional[float] = None  # None: walk on the next query
+        self._lock = threading.Lock()
+        self.refreshes = 0
+        self.rehashed = 0
+
+    def files(self, directory: str = ".", force: bool = False) -> List[Dict]:
+        """Indexed files (path, name, size, mtime, content_hash, extension), optionally under a directory."""
+        self.refresh(force)
+        prefix = "" if directory in ("", ".") else directory.strip("/") + "/"
+        with self._lock:
+            entries = [dict(entry) for path, entry in sorted(self._entries.items()) if path.startswith(prefix)]
+        for entry in entries:
+            entry["name"] = entry["path"].rsplit("/", 1)[-1]
+        return entries
+
+    def get(self, path: str) -> Optional[Dict]:
+        """One file's index entry, if it is indexed."""
+        self.refresh()
+        with self._lock:
+            entry = self._entries.get(path)
+            return dict(entry) if entry else None
+
+    def refresh(self, force: bool = False) -> Changes:
+        """Re-walk the project unless it was walked within refresh_interval; returns what changed."""
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            elif not force and self._refreshed_at is not None and (
+                self.watched or time.monotonic() - self._refreshed_at < self.refresh_interval
+            ):
+                return []
+
+            found = self.walker.files() if self.root.exists() else {}
+            upserts = self._changed(found)
+            deletes = [path for path in self._entries if path not in found]
+            for path in deletes:
+                self._entries.pop(path, None)
+            for entry in upserts:
+                self._entries[entry["path"]] = entry
+            self._refreshed_at = time.monotonic()
+            self.refreshes += 1
+            self.rehashed += len(upserts)
+
+        if upserts or deletes:
+            logger.info(f"File index: {len(upserts)} changed, {len(deletes)} removed")
+            self._persist(upserts, deletes)
+        return [(entry["path"], False) for entry in upserts] + [(path, True) for path in deletes]
+
+    def apply_change(self, path: str) -> Changes:
+        """
+        Re-index one path reported changed (a file or directory, relative to root).
+
+        Files are re-stat'ed and re-hashed if their mtime or size moved; a
+        directory is walked; a missing or ignored path drops it and everything
+        under it. A changed .gitignore/.agentignore re-walks the project.
+        """
+        if self.walker.is_ignore_file(path):
+            return self.refresh(force=True)
+        target = self.root / path
+
+        if target.is_dir():
+            found = {} if self.walker.ignored(path, is_dir=True) else self.walker.files(path)
+            prefix = path + "/"
+            with self._lock:
+                if self._entries is None:
+                    self._entries = self._load()
+                upserts = self._changed(found)
+                deletes = [p for p in self._entries if p.startswith(prefix) and p not in found]
+        else:
+            try:
+                stat = None if self.walker.ignored(path) else target.stat()
+            except OSError:
+                stat = None
+            with self._lock:
+                if self._entries is None:
+                    self._entries = self._load()
+                if stat is not None:
+                    upserts, deletes = self._changed({path: stat}), []
+                else:
+                    upserts = []
+                    deletes = [p for p in self._entries if p == path or p.startswith(path + "/")]
+
+        with self._lock:
+            for removed in deletes:
+                self._entries.pop(removed, None)
+            for entry in upserts:
+                self._entries[entry["path"]] = entry
+            self.rehashed += len(upserts)
+        if upserts or deletes:
+            self._persist(upserts, deletes)
+        return [(entry["path"], False) for entry in upserts] + [(removed, True) for removed in deletes]
+
+    def _persist(self, upserts: List[Dict], deletes: List[str]):
+        try:
+            db.update_file_index(str(self.root), upserts, deletes)
+        except Exception as e:
+            logger.warning(f"Could not persist file index: {e}")
+
+    def invalidate(self):
+        """Make the next query re-walk the project."""
+        with self._lock:
+            self._refreshed_at = None
+
+    def _load(self) -> Dict[str, Dict]:
+        # Caller holds self._lock
+        try:
+            return {entry["path"]: entry for entry in db.get_file_index_entries(str(self.root))}
+        except Exception as e:
+            logger.warning(f"Could not load file index: {e}")
+            return {}
+
+    def _changed(self, found: Dict[str, os.stat_result]) -> List[Dict]:
+        """New rows for the found files whose mtime or size differ from the index."""
+        # Caller holds self._lock
+        upserts = []
+        for path, stat in found.items():
+            entry = self._entries.get(path)
+            if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                continue
+            upserts.append({
+                "path": path,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "content_hash": content_hash(self.root / path),
+                "extension": os.path.splitext(path)[1]
+            })
+        return upserts
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "files": len(self._entries or {}),
+                "refreshes": self.refreshes,
+                "rehashed": self.rehashed
+            }
+
+
+_index: Optional[FileIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> FileIndex:
+    """Return the process-wide index of the target project."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = FileIndex()
+    return _index
@@ -0,0 +1,206 @@
+"""
+Local BM25 ranking of target project files.
+
+identify_relevant_files used to send every path in the project to Claude.
+This keeps an in-memory inverted index over each file's path and content
+(identifiers split on camelCase/snake_case) and scores files against the
+task with BM25, so only a shortlist goes to the model. The index is
+updated incrementally: files are re-read only when their mtime or size
+changes.
+"""
+
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from . import file_watcher
+from .config import TARGET_PROJECT_DIR, MAX_FILE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# A term in the file's path counts this many times (paths are strong signals)
+PATH_WEIGHT = 5
+
+_IDENTIFIER = re.compile(r"[A-Za-z][A-Za-z0-9]*")
+_CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+STOP_WORDS = {
+    "the", "and", "for", "with", "that", "this", "from", "into", "are", "was", "not",
+    "all", "any", "can", "should", "when", "which", "please", "make", "add", "fix",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased terms: identifiers plus their camelCase/snake_case parts."""
+    terms = []
+    for identifier in _IDENTIFIER.findall(text or ""):
+        lowered = identifier.lower()
+        parts = [part.lower() for part in _CAMEL.findall(identifier)]
+        if len(lowered) > 2 and lowered not in STOP_WORDS:
+            terms.append(lowered)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if len(part) > 2 and part not in STOP_WORDS)
+    return terms
+
+
+class FileRanker:
+    """Inverted index of file path/content terms with BM25 scoring."""
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, int]] = {}   # term -> {path: term frequency}
+        self._doc_terms: Dict[str, Counter] = {}         # path -> term counts
+        self._doc_length: Dict[str, int] = {}
+        self._signature: Dict[str, Tuple[float, int]] = {}  # path -> (mtime, size) when indexed
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def refresh(self, files: List[Dict]):
+        """Bring the index in line with ``files`` (dicts with "path"), re-reading only changed ones.
+
+        Entries that carry "mtime" and "size" (file index rows) aren't stat'ed again.
+        """
+        seen = set()
+        for entry in files:
+            path = entry["path"]
+            seen.add(path)
+            if "mtime" in entry:
+                signature = (entry["mtime"], entry["size"])
+            else:
+                try:
+                    stat = (TARGET_PROJECT_DIR / path).stat()
+                except OSError:
+                    continue
+                signature = (stat.st_mtime, stat.st_size)
+            if self._signature.get(path) != signature:
+                self.update(path, signature)
+
+        with self._lock:
+            stale = [path for path in self._doc_terms if path not in seen]
+        for path in stale:
+            self.remove(path)
+
+    def update(self, path: str, signature: Optional[Tuple[float, int]] = None):
+        """(Re)index one file from disk."""
+        target = TARGET_PROJECT_DIR / path
+        try:
+            if signature is None:
+                stat = target.stat()
+                signature = (stat.st_mtime, stat.st_size)
+            content = target.read_text(encoding="utf-8", errors="ignore") if signature[1] <= MAX_FILE_SIZE else ""
+        except OSError:
+            self.remove(path)
+            return
+
+        counts = Counter(tokenize(content))
+        for term in tokenize(path.replace("/", " ").replace(".", " ")):
+            counts[term] += PATH_WEIGHT
+
+        with self._lock:
+            self._remove_locked(path)
+            self._doc_terms[path] = counts
+            length = sum(counts.values())
+            self._doc_length[path] = length
+            self._total_length += length
+            self._signature[path] = signature
+            for term, frequency in counts.items():
+                self._postings.setdefault(term, {})[path] = frequency
+
+    def remove(self, path: str):
+        """Drop a file from the index."""
+        with self._lock:
+            self._remove_locked(path)
+
+    def _remove_locked(self, path: str):
+        counts = self._doc_terms.pop(path, None)
+        if counts is None:
+            return
+        self._total_length -= self._doc_length.pop(path, 0)
+        self._signature.pop(path, None)
+        for term in counts:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(path, None)
+                if not postings:
+                    del self._postings[term]
+
+    def rank(self, query: str, limit: int = 50) -> List[Tuple[str, float]]:
+        """Top ``limit`` (path, score) pairs for the query, best first; only files that match."""
+        terms = set(tokenize(query))
+        with self._lock:
+            total_docs = len(self._doc_terms)
+            if not total_docs or not terms:
+                return []
+            average_length = self._total_length / total_docs
+
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for path, frequency in postings.items():
+                    norm = K1 * (1 - B + B * self._doc_length[path] / average_length)
+                    scores[path] = scores.get(path, 0.0) + idf * frequency * (K1 + 1) / (frequency + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def confident_selection(self, query: str, ranked: List[Tuple[str, float]], max_files: int) -> Optional[List[str]]:
+        """
+        Files to use directly when the ranking is clear-cut, else None.
+
+        Clear-cut means the best file contains at least half of the query's
+        terms (and at least two), at most ``max_files`` files score within
+        half of the best, and every other file scores under a quarter of it.
+        """
+        if not ranked:
+            return None
+        terms = set(tokenize(query))
+        with self._lock:
+            best_terms = self._doc_terms.get(ranked[0][0], Counter())
+            matched = sum(1 for term in terms if term in best_terms)
+        if matched < 2 or matched < len(terms) / 2:
+            return None
+
+        top = ranked[0][1]
+        leaders = [path for path, score in ranked if score >= top / 2]
+        if len(leaders) > max_files:
+            return None
+        runners_up = ranked[len(leaders):]
+        if runners_up and runners_up[0][1] >= top / 4:
+            return None
+        return leaders
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+
+_ranker: Optional[FileRanker] = None
+_ranker_lock = threading.Lock()
+
+
+def get_ranker() -> FileRanker:
+    """Return the process-wide file ranker."""
+    global _ranker
+    if _ranker is None:
+        with _ranker_lock:
+            if _ranker is None:
+                _ranker = FileRanker()
+    return _ranker
+
+
+@file_watcher.on_change
+def _file_changed(path: str, deleted: bool):
+    """Keep the ranker's postings current as the watcher reports edits."""
+    if _ranker is None:
+        return
+    if deleted:
+        _ranker.remove(path)
+    else:
+        _ranker.update(path)
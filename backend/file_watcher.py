@@ -0,0 +1,305 @@
+"""
+Target project change watcher.
+
+Keeps the file index (and everything derived from it) current without
+walking the tree on each request. On Linux it uses inotify through ctypes,
+watching every directory the index covers; elsewhere, or if inotify is
+unavailable or out of watches, it falls back to re-walking the project
+every FILE_WATCHER_POLL_INTERVAL seconds in the background.
+
+Changed paths go to the file index first; then every callback registered
+with on_change(path, deleted) is called, so caches like the BM25 ranker,
+the symbol index and route scans can drop what went stale.
+"""
+
+import atexit
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import threading
+from typing import Callable, Dict, List, Optional
+
+from . import file_index
+from .config import FILE_WATCHER, FILE_WATCHER_POLL_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# inotify(7) constants
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+# callback(relative path, deleted)
+ChangeCallback = Callable[[str, bool], None]
+
+_listeners: List[ChangeCallback] = []
+_listeners_lock = threading.Lock()
+
+
+def on_change(callback: ChangeCallback) -> ChangeCallback:
+    """Register a callback for indexed file changes (usable as a decorator)."""
+    with _listeners_lock:
+        _listeners.append(callback)
+    return callback
+
+
+def notify(changes: file_index.Changes):
+    """Pass (path, deleted) changes to every registered callback."""
+    with _listeners_lock:
+        listeners = list(_listeners)
+    for path, deleted in changes:
+        for callback in listeners:
+            try:
+                callback(path, deleted)
+            except Exception as e:
+                logger.warning(f"Change callback {getattr(callback, '__name__', callback)} failed for {path}: {e}")
+
+
+class _Inotify:
+    """Minimal ctypes binding to the inotify syscalls."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+
+    def add_watch(self, path: str, mask: int = WATCH_MASK) -> int:
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        if self._rm_watch(self.fd, wd) < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+
+    def read_events(self, timeout: float):
+        """Yield (wd, mask, cookie, name) for events that arrive within timeout seconds."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            yield wd, mask, cookie, os.fsdecode(name)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FileWatcher:
+    """Background thread feeding target project changes to the file index."""
+
+    def __init__(
+        self,
+        index: Optional[file_index.FileIndex] = None,
+        mode: str = FILE_WATCHER,
+        poll_interval: float = FILE_WATCHER_POLL_INTERVAL
+    ):
+        self.index = index or file_index.get_index()
+        self.root = self.index.root
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.backend: Optional[str] = None
+        self._inotify: Optional[_Inotify] = None
+        self._watches: Dict[int, str] = {}  # wd -> directory relative to root ("" for root)
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.events = 0
+        self.changes = 0
+
+    def start(self) -> Optional[str]:
+        """Start watching; returns the backend in use ("inotify", "poll") or None if off."""
+        if self.mode == "off" or self._thread is not None:
+            return self.backend
+        if not self.root.exists():
+            logger.warning(f"Not watching {self.root}: directory not found")
+            return None
+
+        if self.mode == "auto":
+            try:
+                self._inotify = _Inotify()
+                self._watch_tree("")
+                self.backend = "inotify"
+            except (OSError, AttributeError) as e:
+                logger.info(f"inotify unavailable ({e}); polling {self.root} instead")
+                self._close_inotify()
+        if self.backend is None:
+            self.backend = "poll"
+
+        # Watches are in place first, so nothing changes unseen between the walk and the events
+        notify(self.index.refresh(force=True))
+        self.index.watched = True
+
+        target = self._run_inotify if self.backend == "inotify" else self._run_poll
+        self._thread = threading.Thread(target=target, name="file-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Watching {self.root} for changes ({self.backend})")
+        return self.backend
+
+    def stop(self):
+        """Stop the watcher; the index goes back to throttled re-walks."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._close_inotify()
+        self.index.watched = False
+
+    def _watch_tree(self, relative: str):
+        """Add watches for a directory and every directory the walker would descend into below it."""
+        for directory in self.index.walker.directories(relative):
+            try:
+                self._watches[self._inotify.add_watch(str(self.root / directory))] = directory
+            except OSError as e:
+                # A subdirectory that vanished or can't be read isn't fatal; running out of watches is
+                if not directory or e.errno not in (errno.ENOENT, errno.EACCES, errno.ENOTDIR):
+                    raise
+
+    def _rename_watches(self, old: str, new: str):
+        """Re-key the watches under a directory moved from old to new (the watches follow the inodes)."""
+        for wd, directory in list(self._watches.items()):
+            if directory == old or directory.startswith(old + "/"):
+                self._watches[wd] = new + directory[len(old):]
+
+    def _unwatch(self, relative: str):
+        """Remove the watches on a directory and everything below it."""
+        for wd, directory in list(self._watches.items()):
+            if directory == relative or directory.startswith(relative + "/"):
+                del self._watches[wd]
+                try:
+                    self._inotify.rm_watch(wd)
+                except OSError:
+                    pass  # already gone with its directory
+
+    def _close_inotify(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._watches.clear()
+
+    def _apply(self, paths):
+        changes = []
+        for path in sorted(paths):
+            changes.extend(self.index.apply_change(path))
+        if changes:
+            self.changes += len(changes)
+            notify(changes)
+
+    def _run_inotify(self):
+        while not self._stopping.is_set():
+            try:
+                changed = set()
+                overflow = False
+                moved_from = {}  # move cookie -> old path of a directory moved away
+                for wd, mask, cookie, name in self._inotify.read_events(timeout=1.0):
+                    self.events += 1
+                    if mask & IN_Q_OVERFLOW:
+                        overflow = True
+                        continue
+                    if mask & IN_IGNORED:
+                        self._watches.pop(wd, None)
+                        continue
+                    directory = self._watches.get(wd)
+                    if directory is None or not name:
+                        continue
+                    path = f"{directory}/{name}" if directory else name
+                    if mask & IN_ISDIR and mask & IN_MOVED_FROM:
+                        moved_from[cookie] = path
+                    elif mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                        old = moved_from.pop(cookie, None) if mask & IN_MOVED_TO else None
+                        if old is not None:
+                            self._rename_watches(old, path)
+                        if self.index.walker.ignored(path, is_dir=True):
+                            self._unwatch(path)
+                        else:
+                            self._watch_tree(path)
+                    elif self.index.walker.is_ignore_file(path):
+                        self._watch_tree("")  # directories it stopped ignoring need watches too
+                    changed.add(path)
+
+                # Directories moved out of the project: stop watching them
+                for old in moved_from.values():
+                    self._unwatch(old)
+
+                if overflow:
+                    logger.warning("inotify queue overflowed; re-walking the project")
+                    notify(self.index.refresh(force=True))
+                elif changed:
+                    self._apply(changed)
+            except OSError as e:
+                if self._stopping.is_set():
+                    break
+                logger.error(f"File watcher error ({e}); falling back to polling")
+                self._close_inotify()
+                self.backend = "poll"
+                self._run_poll()
+                return
+            except Exception as e:
+                logger.error(f"File watcher error: {e}")
+
+    def _run_poll(self):
+        while not self._stopping.wait(self.poll_interval):
+            try:
+                changes = self.index.refresh(force=True)
+                if changes:
+                    self.changes += len(changes)
+                    notify(changes)
+            except Exception as e:
+                logger.error(f"File watcher poll failed: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            "backend": self.backend,
+            "watches": len(self._watches),
+            "events": self.events,
+            "changes": self.changes
+        }
+
+
+_watcher: Optional[FileWatcher] = None
+_watcher_lock = threading.Lock()
+
+
+def get_watcher() -> FileWatcher:
+    """Return the process-wide file watcher (not started)."""
+    global _watcher
+    if _watcher is None:
+        with _watcher_lock:
+            if _watcher is None:
+                _watcher = FileWatcher()
+    return _watcher
+
+
+def start() -> Optional[str]:
+    """Start the process-wide watcher (per FILE_WATCHER); returns its backend."""
+    watcher = get_watcher()
+    if watcher.backend is None and watcher.start():
+        atexit.register(watcher.stop)
+    return watcher.backend
@@ -0,0 +1,175 @@
+"""
+Response cache for Claude calls.
+
+Identical requests (same model, system prompt, messages and max_tokens)
+get the same answer from an in-process LRU, falling back to the
+llm_response_cache table so hits survive restarts. Entries expire after
+LLM_CACHE_TTL seconds; the table is trimmed to LLM_CACHE_MAX_ENTRIES.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from . import database as db
+from .config import (
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_TTL,
+    LLM_CACHE_MEMORY_ENTRIES,
+    LLM_CACHE_MAX_ENTRIES
+)
+
+logger = logging.getLogger(__name__)
+
+# Prune the SQLite store after this many writes
+PRUNE_EVERY = 50
+
+
+def _strip_cache_control(value):
+    """Drop prompt-cache markers, which don't change the model's answer."""
+    if isinstance(value, dict):
+        return {k: _strip_cache_control(v) for k, v in value.items() if k != "cache_control"}
+    if isinstance(value, list):
+        return [_strip_cache_control(v) for v in value]
+    return value
+
+
+def cache_key(model: str, system, messages: List[Dict], max_tokens: int) -> str:
+    """Stable hash of everything that determines a reply."""
+    payload = json.dumps(
+        {
+            "model": model,
+            "system": _strip_cache_control(system),
+            "messages": _strip_cache_control(messages),
+            "max_tokens": max_tokens
+        },
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """In-memory LRU in front of the SQLite response table."""
+
+    def __init__(
+        self,
+        ttl: int = LLM_CACHE_TTL,
+        memory_entries: int = LLM_CACHE_MEMORY_ENTRIES,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        enabled: bool = LLM_CACHE_ENABLED
+    ):
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached reply for key, or None (counted as a miss)."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, response = entry
+                if time.monotonic() - stored_at < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return response
+                del self._memory[key]
+
+        try:
+            cached = db.get_cached_response(key, self.ttl)
+        except Exception as e:
+            logger.warning(f"Response cache lookup failed: {e}")
+            cached = None
+
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+                return None
+            response, age = cached
+            self.disk_hits += 1
+            # Expires in memory when the row does, not a full TTL from now
+            self._remember(key, response, age)
+        return response
+
+    def put(self, key: str, response: str, purpose: Optional[str] = None, model: Optional[str] = None):
+        """Store a reply in memory and in the SQLite table."""
+        with self._lock:
+            self._remember(key, response)
+            self._writes_since_prune += 1
+            prune = self._writes_since_prune >= PRUNE_EVERY
+            if prune:
+                self._writes_since_prune = 0
+
+        try:
+            db.store_cached_response(key, response, purpose, model)
+            if prune:
+                removed = db.prune_response_cache(self.ttl, self.max_entries)
+                with self._lock:
+                    self.evictions += removed
+        except Exception as e:
+            logger.warning(f"Response cache write failed: {e}")
+
+    def note_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def clear(self):
+        """Forget every cached reply (memory and SQLite)."""
+        with self._lock:
+            self._memory.clear()
+        db.clear_response_cache()
+
+    def _remember(self, key: str, response: str, age: float = 0.0):
+        # Caller holds self._lock; age is how long ago the reply was created
+        self._memory[key] = (time.monotonic() - age, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for the status endpoint."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "memory_entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+                "hit_rate": round(hits / lookups, 3) if lookups else None
+            }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ResponseCache:
+    """Return the process-wide response cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def stats() -> Dict:
+    return get_cache().stats()
@@ -2,17 +2,30 @@
 Flask routes for the AI Agent API.
 """
 
+import json
+import uuid
 import requests
-from flask import Blueprint, request, jsonify, render_template, current_app, session
+from flask import (
+    Blueprint, Response, request, jsonify, render_template, current_app, session, stream_with_context
+)
 from . import database as db
 from . import routes_generator
+from . import audit_queue
+from . import file_index
+from . import file_watcher
+from . import llm_cache
+from . import symbol_index
 from .auth import login_user, logout_user, get_current_user, login_required
 from .config import (
     DEMO_DIR,
     TARGET_PROJECT_DIR,
     ALLOWED_EXTENSIONS,
     MAX_FILE_SIZE,
-    CLAUDE_MODEL
+    CLAUDE_MODEL,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    DEFAULT_DIFF_CONTEXT,
+    MAX_DIFF_CONTEXT
 )
 
 # Create blueprint
@@ -24,6 +37,49 @@ def get_agent():
     return current_app.config['AGENT']
 
 
+def get_bool_arg(name: str) -> bool:
+    """Read a boolean query flag such as ?include_content=1."""
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+def get_diff_context_arg() -> int:
+    """Read ?context= (diff context lines), clamped to 0..MAX_DIFF_CONTEXT."""
+    context_lines = request.args.get('context', DEFAULT_DIFF_CONTEXT, type=int)
+    return max(0, min(context_lines, MAX_DIFF_CONTEXT))
+
+
+def get_page_args(default_limit: int = DEFAULT_PAGE_SIZE):
+    """Read ?limit= and ?cursor= for a keyset-paginated list endpoint."""
+    limit = request.args.get('limit', default_limit, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    cursor = request.args.get('cursor') or None
+    return limit, cursor
+
+
+def conversation_key(ticket_id: int = None) -> str:
+    """History key for the caller: the logged-in user or this browser session, per ticket if given."""
+    if session.get('user_id'):
+        key = f"user:{session['user_id']}"
+    else:
+        if 'conversation_id' not in session:
+            session['conversation_id'] = uuid.uuid4().hex
+        key = f"session:{session['conversation_id']}"
+    return f"{key}:ticket:{ticket_id}" if ticket_id else key
+
+
+def sse_response(events):
+    """Stream agent events ({"type": ..., ...}) to the browser as Server-Sent Events."""
+    def generate():
+        for event in events:
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 # =============================================================================
 # MAIN ROUTES
 # =============================================================================
@@ -86,7 +142,7 @@ def api_chat():
     if not user_message:
         return jsonify({"error": "Message cannot be empty"}), 400
 
-    response = get_agent().chat(user_message, app=current_app)
+    response = get_agent().chat(user_message, app=current_app, conversation_key=conversation_key())
     return jsonify({"response": response})
 
 
@@ -99,10 +155,36 @@ def api_process_task():
     if not task:
         return jsonify({"error": "Task description required"}), 400
 
-    result = get_agent().process_task_two_step(task)
+    result = get_agent().process_task_two_step(task, conversation_key=conversation_key())
     return jsonify(result)
 
 
+@api.route('/api/chat/stream', methods=['POST'])
+def api_chat_stream():
+    """Chat endpoint streamed as SSE (delta events, then done or error)."""
+    data = request.json
+    user_message = data.get('message', '').strip()
+
+    if not user_message:
+        return jsonify({"error": "Message cannot be empty"}), 400
+
+    return sse_response(get_agent().chat_stream(
+        user_message, app=current_app._get_current_object(), conversation_key=conversation_key()
+    ))
+
+
+@api.route('/api/task/stream', methods=['POST'])
+def api_process_task_stream():
+    """Two-step task streamed as SSE (files, delta events, then done or error)."""
+    data = request.json
+    task = data.get('task', '').strip()
+
+    if not task:
+        return jsonify({"error": "Task description required"}), 400
+
+    return sse_response(get_agent().task_stream(task, conversation_key=conversation_key()))
+
+
 # =============================================================================
 # FILE ROUTES
 # =============================================================================
@@ -114,6 +196,17 @@ def api_list_files():
     return jsonify(get_agent().list_files(directory))
 
 
+@api.route('/api/files/activity', methods=['GET'])
+def api_file_activity():
+    """Tickets and changes that touched a file (?file=path)."""
+    file_path = request.args.get('file', '').strip()
+    if not file_path:
+        return jsonify({"error": "Query parameter file required"}), 400
+
+    limit, _ = get_page_args()
+    return jsonify(db.get_file_activity(file_path, limit))
+
+
 @api.route('/api/file/read', methods=['POST'])
 def api_read_file():
     """Read a specific file."""
@@ -136,7 +229,7 @@ def api_modify_file():
     if not file_path or not instruction:
         return jsonify({"error": "File path and instruction required"}), 400
 
-    result = get_agent().modify_file_with_claude(file_path, instruction)
+    result = get_agent().modify_file_with_claude(file_path, instruction, conversation_key=conversation_key())
     return jsonify(result)
 
 
@@ -146,11 +239,19 @@ def api_modify_file():
 
 @api.route('/api/history/clear', methods=['POST'])
 def api_clear_history():
-    """Clear conversation history."""
-    get_agent().clear_history()
+    """Clear the caller's conversation history (or a ticket's, with {"ticket_id": N})."""
+    data = request.get_json(silent=True) or {}
+    get_agent().clear_history(conversation_key(data.get('ticket_id')))
     return jsonify({"status": "Conversation history cleared"})
 
 
+@api.route('/api/llm-cache/clear', methods=['POST'])
+def api_clear_llm_cache():
+    """Drop every cached model response."""
+    llm_cache.get_cache().clear()
+    return jsonify({"status": "Response cache cleared"})
+
+
 @api.route('/api/status', methods=['GET'])
 def api_status():
     """Get agent status."""
@@ -159,7 +260,14 @@ def api_status():
         "model": CLAUDE_MODEL,
         "target_dir": str(TARGET_PROJECT_DIR),
         "allowed_extensions": list(ALLOWED_EXTENSIONS),
-        "max_file_size": MAX_FILE_SIZE
+        "max_file_size": MAX_FILE_SIZE,
+        "audit_queue": audit_queue.stats(),
+        "llm_usage": db.get_llm_usage_summary(),
+        "llm_cache": llm_cache.stats(),
+        "conversations": get_agent().conversations.stats(),
+        "symbol_index": symbol_index.get_index().stats(),
+        "file_index": file_index.get_index().stats(),
+        "file_watcher": file_watcher.get_watcher().stats()
     })
 
 
@@ -380,10 +488,21 @@ def api_create_project():
 
 @api.route('/api/tickets', methods=['GET'])
 def api_get_tickets():
-    """Get tickets with optional filters."""
+    """Get tickets with optional filters, e.g. ?status=&category=&file= (cursor-paginated)."""
     project_id = request.args.get('project_id', type=int)
     status = request.args.get('status')
-    return jsonify({"tickets": db.get_tickets(project_id, status)})
+    category = request.args.get('category') or None
+    file_path = request.args.get('file') or None
+    limit, cursor = get_page_args()
+
+    try:
+        rows = db.get_tickets(project_id, status, limit=limit + 1, cursor=cursor,
+                              file_path=file_path, category=category)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    tickets, next_cursor = db.split_page(rows, limit)
+    return jsonify({"tickets": tickets, "next_cursor": next_cursor})
 
 
 @api.route('/api/tickets', methods=['POST'])
@@ -471,7 +590,7 @@ Please:
 
     # Use the agent's two-step process with project context
     agent = get_agent()
-    result = agent.process_task_two_step(task, project_id=project_id)
+    result = agent.process_task_two_step(task, project_id=project_id, conversation_key=conversation_key(ticket_id))
 
     if result.get('error'):
         return jsonify(result), 400
@@ -487,7 +606,7 @@ Please:
     )
 
     # Auto-generate proposed changes for files that need modification
-    proposed_changes = []
+    to_propose = []
     if 'FILES_TO_MODIFY:' in ai_response:
         # Parse the files to modify section
         lines = ai_response.split('FILES_TO_MODIFY:')[-1].strip().split('\n')
@@ -498,18 +617,17 @@ Please:
                 file_path = parts[0].strip()
                 instruction = parts[1].strip() if len(parts) > 1 else f"Apply fix for: {ticket['title']}"
 
-                # Generate proposed change for this file
                 if file_path in files_analyzed:
-                    change_result = agent.propose_file_change(
-                        file_path,
-                        f"{ticket['title']}: {instruction}",
-                        ticket_id
-                    )
-                    if change_result.get('status') == 'proposed':
-                        proposed_changes.append({
-                            'file': file_path,
-                            'change_id': change_result.get('change_id')
-                        })
+                    to_propose.append((file_path, f"{ticket['title']}: {instruction}"))
+
+    # Generate the per-file proposals concurrently
+    proposed_changes = []
+    for (file_path, _), change_result in zip(to_propose, agent.propose_file_changes(to_propose, ticket_id)):
+        if change_result.get('status') == 'proposed':
+            proposed_changes.append({
+                'file': file_path,
+                'change_id': change_result.get('change_id')
+            })
 
     return jsonify({
         "status": "success",
@@ -535,22 +653,21 @@ def api_ticket_ai_action(ticket_id):
     agent = get_agent()
 
     if action == 'accept':
-        # Apply all pending proposed changes for this ticket
-        pending_changes = db.get_proposed_changes_for_ticket(ticket_id)
-        applied_changes = []
-
-        for change in pending_changes:
-            if change['status'] == 'pending':
-                result = agent.apply_proposed_change(change['id'])
-                if result.get('status') == 'applied':
-                    applied_changes.append(change['file_path'])
-
-        db.update_ticket_ai_status(ticket_id, 'accepted')
+        # Apply all pending proposed changes and resolve the ticket in one transaction
+        result = agent.apply_ticket_changes(ticket_id, project_id=ticket.get('project_id'))
+        if result.get('error'):
+            return jsonify(result), 500
+        if result['status'] == 'nothing_to_apply':
+            return jsonify({
+                "error": "No pending changes to apply",
+                "errors": result['errors']
+            }), 409
 
         return jsonify({
             "status": "success",
             "message": "AI suggestion accepted, ticket resolved",
-            "applied_changes": applied_changes
+            "applied_changes": result['applied_changes'],
+            "errors": result['errors']
         })
 
     elif action == 'reject':
@@ -577,7 +694,7 @@ Previous AI suggestion: {ticket.get('ai_suggestion', 'None')}
 
 User's follow-up question: {message}"""
 
-        response = agent.chat(context, app=current_app)
+        response = agent.chat(context, app=current_app, conversation_key=conversation_key(ticket_id))
 
         return jsonify({
             "status": "success",
@@ -585,6 +702,19 @@ User's follow-up question: {message}"""
         })
 
 
+def ticket_chat_message(ticket: dict, message: str) -> str:
+    """Wrap a user message with the ticket's details for the chat endpoints."""
+    return f"""Discussing ticket #{ticket['id']}:
+Title: {ticket['title']}
+Category: {ticket['category']}
+Priority: {ticket['priority']}
+Status: {ticket['status']}
+Description: {ticket.get('description') or 'None'}
+AI Suggestion: {ticket.get('ai_suggestion') or 'None'}
+
+User message: {message}"""
+
+
 @api.route('/api/tickets/<int:ticket_id>/chat', methods=['POST'])
 def api_ticket_chat(ticket_id):
     """Chat about a specific ticket."""
@@ -598,19 +728,10 @@ def api_ticket_chat(ticket_id):
     if not ticket:
         return jsonify({"error": "Ticket not found"}), 404
 
-    # Build context
-    context = f"""Discussing ticket #{ticket_id}:
-Title: {ticket['title']}
-Category: {ticket['category']}
-Priority: {ticket['priority']}
-Status: {ticket['status']}
-Description: {ticket.get('description') or 'None'}
-AI Suggestion: {ticket.get('ai_suggestion') or 'None'}
-
-User message: {message}"""
-
     agent = get_agent()
-    response = agent.chat(context, app=current_app)
+    response = agent.chat(
+        ticket_chat_message(ticket, message), app=current_app, conversation_key=conversation_key(ticket_id)
+    )
 
     return jsonify({
         "status": "success",
@@ -618,30 +739,52 @@ User message: {message}"""
     })
 
 
+@api.route('/api/tickets/<int:ticket_id>/chat/stream', methods=['POST'])
+def api_ticket_chat_stream(ticket_id):
+    """Chat about a specific ticket, streamed as SSE."""
+    data = request.json
+    message = data.get('message', '').strip()
+
+    if not message:
+        return jsonify({"error": "Message required"}), 400
+
+    ticket = db.get_ticket_by_id(ticket_id)
+    if not ticket:
+        return jsonify({"error": "Ticket not found"}), 404
+
+    return sse_response(get_agent().chat_stream(
+        ticket_chat_message(ticket, message),
+        app=current_app._get_current_object(),
+        conversation_key=conversation_key(ticket_id)
+    ))
+
+
 # =============================================================================
 # PROPOSED CHANGES ROUTES
 # =============================================================================
 
 @api.route('/api/proposed-changes', methods=['GET'])
 def api_get_proposed_changes():
-    """Get all pending proposed changes."""
-    changes = db.get_pending_proposed_changes()
+    """Get all pending proposed changes (add ?include_content=1 for file bodies)."""
+    changes = db.get_pending_proposed_changes(include_content=get_bool_arg('include_content'))
     return jsonify({"changes": changes})
 
 
 @api.route('/api/proposed-changes/<int:change_id>', methods=['GET'])
 def api_get_proposed_change(change_id):
-    """Get a specific proposed change."""
-    change = db.get_proposed_change(change_id)
+    """Get a specific proposed change with its unified diff (?context=N, ?include_content=1)."""
+    change = db.get_proposed_change(change_id, include_content=get_bool_arg('include_content'))
     if not change:
         return jsonify({"error": "Proposed change not found"}), 404
+    db.attach_diffs([change], get_diff_context_arg())
     return jsonify({"change": change})
 
 
 @api.route('/api/tickets/<int:ticket_id>/proposed-changes', methods=['GET'])
 def api_get_ticket_proposed_changes(ticket_id):
-    """Get all proposed changes for a ticket."""
-    changes = db.get_proposed_changes_for_ticket(ticket_id)
+    """Get all proposed changes for a ticket with unified diffs (?context=N, ?include_content=1)."""
+    changes = db.get_proposed_changes_for_ticket(ticket_id, include_content=get_bool_arg('include_content'))
+    db.attach_diffs(changes, get_diff_context_arg())
     return jsonify({"changes": changes})
 
 
@@ -698,10 +841,57 @@ def api_reject_proposed_change(change_id):
 
 @api.route('/api/changes', methods=['GET'])
 def api_get_changes():
-    """Get changes history."""
+    """Get changes history, optionally ?file= (cursor-paginated)."""
     project_id = request.args.get('project_id', type=int)
-    limit = request.args.get('limit', 50, type=int)
-    return jsonify({"changes": db.get_changes_history(project_id, limit)})
+    file_path = request.args.get('file') or None
+    limit, cursor = get_page_args()
+
+    try:
+        rows = db.get_changes_history(project_id, limit=limit + 1, cursor=cursor, file_path=file_path)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    changes, next_cursor = db.split_page(rows, limit)
+    return jsonify({"changes": changes, "next_cursor": next_cursor})
+
+
+# =============================================================================
+# DASHBOARD ROUTES
+# =============================================================================
+
+@api.route('/api/dashboard/summary', methods=['GET'])
+def api_dashboard_summary():
+    """Ticket counts by status/priority/category, pending changes and AI acceptance rate."""
+    return jsonify(db.get_dashboard_summary())
+
+
+# =============================================================================
+# SEARCH ROUTES
+# =============================================================================
+
+@api.route('/api/search', methods=['GET'])
+def api_search():
+    """Ranked full-text search over tickets, AI findings and change history."""
+    text = request.args.get('q', '').strip()
+    if not text:
+        return jsonify({"error": "Query parameter q required"}), 400
+
+    if not db.FTS_AVAILABLE:
+        return jsonify({"error": "Full-text search is not available in this SQLite build"}), 501
+
+    types = [t for t in request.args.get('type', '').split(',') if t] or None
+    if types and any(t not in db.SEARCH_SOURCES for t in types):
+        return jsonify({"error": f"type must be one of: {', '.join(db.SEARCH_SOURCES)}"}), 400
+
+    project_id = request.args.get('project_id', type=int)
+    limit, _ = get_page_args(default_limit=20)
+    offset = max(0, request.args.get('offset', 0, type=int))
+
+    rows = db.search(text, types, project_id, limit=limit + 1, offset=offset)
+    results = rows[:limit]
+    next_offset = offset + limit if len(rows) > limit else None
+
+    return jsonify({"query": text, "results": results, "next_offset": next_offset})
 
 
 # =============================================================================
@@ -710,10 +900,19 @@ def api_get_changes():
 
 @api.route('/api/context', methods=['GET'])
 def api_get_context():
-    """Get AI context entries."""
+    """Get AI context entries, optionally ?type=&tag= (cursor-paginated)."""
     project_id = request.args.get('project_id', type=int)
     context_type = request.args.get('type')
-    return jsonify({"context": db.get_ai_context(project_id, context_type)})
+    tag = request.args.get('tag') or None
+    limit, cursor = get_page_args()
+
+    try:
+        rows = db.get_ai_context(project_id, context_type, limit=limit + 1, cursor=cursor, tag=tag)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    contexts, next_cursor = db.split_page(rows, limit)
+    return jsonify({"context": contexts, "next_cursor": next_cursor})
 
 
 @api.route('/api/context', methods=['POST'])
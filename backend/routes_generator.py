@@ -6,11 +6,14 @@ Supports: Flask, Express, FastAPI, Django, and generic pattern matching.
 """
 
 import re
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional
 
-from .config import DEMO_DIR, TARGET_PROJECT_DIR, ALLOWED_EXTENSIONS
+from . import file_index
+from . import file_watcher
+from .config import DEMO_DIR, TARGET_PROJECT_DIR
 
 
 # AI Agent URLs (this app)
@@ -152,10 +155,49 @@ def scan_react_router_routes(content: str, filepath: str) -> List[Dict]:
     return routes
 
 
+def scan_file_routes(content: str, rel_path: str) -> List[Dict]:
+    """Routes declared in one file, by its extension."""
+    routes = []
+    suffix = Path(rel_path).suffix
+
+    # Python files
+    if suffix == '.py':
+        routes.extend(scan_flask_routes(content, rel_path))
+        routes.extend(scan_fastapi_routes(content, rel_path))
+        routes.extend(scan_django_routes(content, rel_path))
+
+    # JavaScript/TypeScript files
+    elif suffix in ['.js', '.jsx', '.ts', '.tsx']:
+        routes.extend(scan_express_routes(content, rel_path))
+        routes.extend(scan_react_router_routes(content, rel_path))
+        routes.extend(scan_nextjs_routes(rel_path))
+
+    return routes
+
+
+# Route scan cache: per-file routes keyed by content hash, plus the merged
+# table for the exact set of (path, hash) pairs it was built from
+_file_routes: Dict[str, tuple] = {}   # path -> (content key, routes)
+_merged: Optional[tuple] = None       # (signature, result)
+_scan_lock = threading.Lock()
+
+
+def _content_key(entry: Dict) -> str:
+    # Files too large to hash fall back to mtime/size
+    return entry["content_hash"] or f"{entry['mtime']}:{entry['size']}"
+
+
+def _copy_result(result: Dict) -> Dict:
+    return dict(result, routes=[dict(route) for route in result["routes"]])
+
+
 def scan_target_project_routes() -> Dict:
-    """Scan the target project directory for all routes."""
-    all_routes = []
-    files_scanned = 0
+    """Scan the target project directory for all routes.
+
+    Only files whose content changed since the last scan are re-read; the
+    merged table is reused outright while no file has changed.
+    """
+    global _merged
 
     if not TARGET_PROJECT_DIR.exists():
         return {
@@ -164,38 +206,34 @@ def scan_target_project_routes() -> Dict:
             "files_scanned": 0
         }
 
-    # Scan all relevant files
-    for filepath in TARGET_PROJECT_DIR.rglob("*"):
-        if not filepath.is_file():
-            continue
-
-        # Skip common non-essential directories
-        path_str = str(filepath)
-        if any(skip in path_str for skip in ['node_modules', '__pycache__', 'venv', '.git', 'dist', 'build']):
-            continue
-
-        if filepath.suffix not in ALLOWED_EXTENSIONS:
-            continue
-
-        try:
-            content = filepath.read_text(encoding='utf-8', errors='ignore')
-            rel_path = str(filepath.relative_to(TARGET_PROJECT_DIR))
-            files_scanned += 1
+    # Scan all relevant files (listed by the incremental file index)
+    entries = file_index.get_index().files()
+    signature = tuple((entry["path"], _content_key(entry)) for entry in entries)
+    with _scan_lock:
+        if _merged is not None and _merged[0] == signature:
+            return dict(_copy_result(_merged[1]), files_rescanned=0)
 
-            # Python files
-            if filepath.suffix == '.py':
-                all_routes.extend(scan_flask_routes(content, rel_path))
-                all_routes.extend(scan_fastapi_routes(content, rel_path))
-                all_routes.extend(scan_django_routes(content, rel_path))
-
-            # JavaScript/TypeScript files
-            elif filepath.suffix in ['.js', '.jsx', '.ts', '.tsx']:
-                all_routes.extend(scan_express_routes(content, rel_path))
-                all_routes.extend(scan_react_router_routes(content, rel_path))
-                all_routes.extend(scan_nextjs_routes(rel_path))
-
-        except Exception:
-            continue
+    all_routes = []
+    files_scanned = 0
+    files_rescanned = 0
+    for entry in entries:
+        rel_path = entry["path"]
+        key = _content_key(entry)
+        with _scan_lock:
+            cached = _file_routes.get(rel_path)
+        if cached and cached[0] == key:
+            routes = cached[1]
+        else:
+            try:
+                content = (TARGET_PROJECT_DIR / rel_path).read_text(encoding='utf-8', errors='ignore')
+                routes = scan_file_routes(content, rel_path)
+            except Exception:
+                continue
+            files_rescanned += 1
+            with _scan_lock:
+                _file_routes[rel_path] = (key, routes)
+        files_scanned += 1
+        all_routes.extend(routes)
 
     # Deduplicate routes
     seen = set()
@@ -206,12 +244,36 @@ def scan_target_project_routes() -> Dict:
             seen.add(key)
             unique_routes.append(route)
 
-    return {
+    result = {
         "target_project": str(TARGET_PROJECT_DIR),
         "files_scanned": files_scanned,
+        "files_rescanned": files_rescanned,
         "routes_found": len(unique_routes),
         "routes": unique_routes
     }
+    with _scan_lock:
+        listed = {entry["path"] for entry in entries}
+        for stale in [path for path in _file_routes if path not in listed]:
+            del _file_routes[stale]
+        _merged = (signature, result)
+    return _copy_result(result)
+
+
+@file_watcher.on_change
+def _file_changed(path: str, deleted: bool):
+    """Forget a changed file's routes and the merged table built from them."""
+    global _merged
+    with _scan_lock:
+        _file_routes.pop(path, None)
+        _merged = None
+
+
+def clear_route_cache():
+    """Drop every cached route scan."""
+    global _merged
+    with _scan_lock:
+        _file_routes.clear()
+        _merged = None
 
 
 def get_agent_routes(app) -> List[Dict]:
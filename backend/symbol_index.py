@@ -0,0 +1,313 @@
+"""
+Symbol index of the target project.
+
+Records the classes, functions, methods and routes of each file with
+their line spans: Python through ``ast``, JavaScript/TypeScript through a
+line scanner with brace matching. For a large file the agent can then
+send only the symbols relevant to a task, verbatim, plus the file's
+imports and the signatures of everything it left out. Parsed files are
+cached by content hash, so only changed files are re-parsed.
+"""
+
+import ast
+import hashlib
+import logging
+import re
+import threading
+from typing import Dict, List, Optional
+
+from . import file_watcher
+from .config import SYMBOL_EXCERPT_MAX_SYMBOLS
+from .file_ranker import tokenize
+
+logger = logging.getLogger(__name__)
+
+PYTHON_EXTENSIONS = {".py"}
+SCRIPT_EXTENSIONS = {".js", ".jsx", ".ts", ".tsx"}
+
+ROUTE_DECORATOR = re.compile(r"\.(route|get|post|put|patch|delete)\(")
+
+
+def _symbol(
+    name: str, kind: str, start: int, end: int, line: int, signature: str, parent: Optional[str] = None
+) -> Dict:
+    """start/end span the symbol (decorators included); line is where its signature is."""
+    return {"name": name, "kind": kind, "start": start, "end": end, "line": line,
+            "signature": signature.strip(), "parent": parent}
+
+
+# =============================================================================
+# PYTHON
+# =============================================================================
+
+def _route_path(decorator) -> Optional[str]:
+    """The path of a @app.route('/x') style decorator, if it is one."""
+    if isinstance(decorator, ast.Call) and decorator.args and isinstance(decorator.args[0], ast.Constant):
+        if ROUTE_DECORATOR.search(ast.unparse(decorator.func) + "("):
+            return str(decorator.args[0].value)
+    return None
+
+
+def parse_python(content: str) -> Dict:
+    """Symbols and import lines of a Python module."""
+    tree = ast.parse(content)
+    lines = content.splitlines()
+    symbols, imports = [], []
+
+    def visit(node, parent=None):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.Import, ast.ImportFrom)) and parent is None:
+                imports.extend(range(child.lineno, (child.end_lineno or child.lineno) + 1))
+            elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                start = min([child.lineno] + [d.lineno for d in child.decorator_list])
+                signature = lines[child.lineno - 1] if child.lineno <= len(lines) else child.name
+                kind = "class" if isinstance(child, ast.ClassDef) else ("method" if parent else "function")
+                routes = [path for path in map(_route_path, child.decorator_list) if path]
+                if routes:
+                    kind = "route"
+                    signature = f"{signature}  # route {', '.join(routes)}"
+                symbols.append(_symbol(child.name, kind, start, child.end_lineno or child.lineno, child.lineno,
+                                       signature, parent))
+                if isinstance(child, ast.ClassDef):
+                    visit(child, child.name)
+
+    visit(tree)
+    return {"symbols": symbols, "imports": imports}
+
+
+# =============================================================================
+# JAVASCRIPT / TYPESCRIPT
+# =============================================================================
+
+_JS_PATTERNS = [
+    ("class", re.compile(r"^\s*(?:export\s+(?:default\s+)?)?(?:abstract\s+)?class\s+([A-Za-z_$][\w$]*)")),
+    ("type", re.compile(r"^\s*(?:export\s+)?(?:interface|enum)\s+([A-Za-z_$][\w$]*)")),
+    ("function", re.compile(
+        r"^\s*(?:export\s+(?:default\s+)?)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)\s*[<(]")),
+    ("function", re.compile(
+        r"^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*(?::[^=]+)?=\s*(?:async\s+)?"
+        r"(?:function\b|(?:\([^)]*\)|[A-Za-z_$][\w$]*)\s*(?::[^=]+)?=>)")),
+    ("route", re.compile(
+        r"^\s*([A-Za-z_$][\w$]*)\.(get|post|put|patch|delete|all|use)\(\s*['\"`]([^'\"`]+)")),
+]
+_JS_METHOD = re.compile(
+    r"^\s*(?:(?:public|private|protected|static|async|get|set)\s+)*([A-Za-z_$][\w$]*)\s*\([^)]*\)\s*(?::[^{]+)?\{")
+_JS_NOT_METHODS = {"if", "for", "while", "switch", "catch", "function", "return", "with"}
+_JS_IMPORT = re.compile(r"^\s*(?:import\s|export\s+\*\s+from|(?:const|let|var)\s+.*=\s*require\()")
+
+
+def _block_end(lines: List[str], start: int) -> int:
+    """Last line (0-based) of the statement starting on ``start``, matching braces."""
+    depth = 0
+    opened = False
+    in_string = None
+    in_block_comment = False
+    for number in range(start, len(lines)):
+        line = lines[number]
+        i = 0
+        while i < len(line):
+            char = line[i]
+            pair = line[i:i + 2]
+            if in_block_comment:
+                if pair == "*/":
+                    in_block_comment = False
+                    i += 1
+            elif in_string:
+                if char == "\\":
+                    i += 1
+                elif char == in_string:
+                    in_string = None
+            elif pair == "//":
+                break
+            elif pair == "/*":
+                in_block_comment = True
+                i += 1
+            elif char in "'\"`":
+                in_string = char
+            elif char == "{":
+                depth += 1
+                opened = True
+            elif char == "}":
+                depth -= 1
+                if opened and depth == 0:
+                    return number
+            elif char == ";" and not opened and depth == 0:
+                return number
+            i += 1
+        if in_string in ("'", '"'):
+            in_string = None  # unterminated quote: don't let it swallow the file
+        if not opened and number > start and not line.strip().endswith((",", "(", "=>", "=")):
+            return number
+    return len(lines) - 1
+
+
+def parse_script(content: str) -> Dict:
+    """Symbols and import lines of a JavaScript/TypeScript module."""
+    lines = content.splitlines()
+    symbols, imports = [], []
+    classes = []  # (name, start, end) 0-based, for methods
+
+    for number, line in enumerate(lines):
+        if _JS_IMPORT.match(line):
+            imports.extend(range(number + 1, _block_end(lines, number) + 2))
+            continue
+
+        enclosing = next((c for c in classes if c[1] < number <= c[2]), None)
+        for kind, pattern in _JS_PATTERNS:
+            match = pattern.match(line)
+            if not match:
+                continue
+            end = _block_end(lines, number)
+            if kind == "route":
+                name = f"{match.group(2).upper()} {match.group(3)}"
+            else:
+                name = match.group(1)
+            symbols.append(_symbol(name, kind, number + 1, end + 1, number + 1, line,
+                                   enclosing[0] if enclosing else None))
+            if kind == "class":
+                classes.append((name, number, end))
+            break
+        else:
+            if enclosing:
+                match = _JS_METHOD.match(line)
+                if match and match.group(1) not in _JS_NOT_METHODS:
+                    end = _block_end(lines, number)
+                    symbols.append(_symbol(match.group(1), "method", number + 1, end + 1, number + 1, line,
+                                           enclosing[0]))
+
+    return {"symbols": symbols, "imports": sorted(set(imports))}
+
+
+# =============================================================================
+# INDEX
+# =============================================================================
+
+def parse_symbols(path: str, content: str) -> Optional[Dict]:
+    """Parse a file by extension; None if the language isn't supported or it doesn't parse."""
+    suffix = "." + path.rsplit(".", 1)[-1] if "." in path else ""
+    try:
+        if suffix in PYTHON_EXTENSIONS:
+            return parse_python(content)
+        if suffix in SCRIPT_EXTENSIONS:
+            return parse_script(content)
+    except (SyntaxError, ValueError, RecursionError) as e:
+        logger.info(f"Could not parse symbols of {path}: {e}")
+    return None
+
+
+class SymbolIndex:
+    """Per-file symbol tables, re-parsed only when a file's content changes."""
+
+    def __init__(self):
+        self._files: Dict[str, tuple] = {}  # path -> (content hash, parsed or None)
+        self._lock = threading.Lock()
+
+    def symbols(self, path: str, content: str) -> Optional[Dict]:
+        """Parsed symbols for path at this content (cached by content hash)."""
+        digest = hashlib.sha1(content.encode("utf-8", "surrogatepass")).hexdigest()
+        with self._lock:
+            cached = self._files.get(path)
+        if cached and cached[0] == digest:
+            return cached[1]
+
+        parsed = parse_symbols(path, content)
+        with self._lock:
+            self._files[path] = (digest, parsed)
+        return parsed
+
+    def invalidate(self, path: str):
+        """Forget a file's symbols (e.g. when it was deleted)."""
+        with self._lock:
+            self._files.pop(path, None)
+
+    def excerpt(self, path: str, content: str, task: str, max_symbols: int = SYMBOL_EXCERPT_MAX_SYMBOLS) -> Optional[str]:
+        """
+        The parts of a file relevant to a task, or None to send it whole.
+
+        Keeps the import lines and the most relevant symbols verbatim (a
+        method brings its class header); every other region collapses to a
+        marker listing the signatures it hides. Returns None when the file
+        can't be parsed or no symbol matches the task.
+        """
+        parsed = self.symbols(path, content)
+        if not parsed or not parsed["symbols"]:
+            return None
+
+        terms = set(tokenize(task))
+        lines = content.splitlines()
+        parents = {s["parent"] for s in parsed["symbols"] if s["parent"]}
+        scored = []
+        for symbol in parsed["symbols"]:
+            if symbol["kind"] == "class" and symbol["name"] in parents:
+                continue  # pick its methods instead of the whole class
+            body_terms = set(tokenize(symbol["name"])) | set(tokenize("\n".join(lines[symbol["start"] - 1:symbol["end"]])))
+            score = len(terms & body_terms) + 2 * len(terms & set(tokenize(symbol["name"])))
+            if score:
+                scored.append((score, symbol))
+        if not scored:
+            return None
+
+        scored.sort(key=lambda item: (-item[0], item[1]["end"] - item[1]["start"]))
+        best = scored[0][0]
+        chosen = [symbol for score, symbol in scored if score * 2 >= best][:max_symbols]
+
+        keep = set(parsed["imports"])
+        by_name = {s["name"]: s for s in parsed["symbols"] if s["kind"] == "class"}
+        for symbol in chosen:
+            keep.update(range(symbol["start"], symbol["end"] + 1))
+            parent = by_name.get(symbol["parent"]) if symbol["parent"] else None
+            if parent:
+                keep.update(range(parent["start"], parent["line"] + 1))
+
+        if len(keep) >= len(lines) * 0.8:
+            return None
+
+        out = []
+        gap_start = None
+        for number in range(1, len(lines) + 2):
+            if number <= len(lines) and number not in keep:
+                if gap_start is None:
+                    gap_start = number
+                continue
+            if gap_start is not None:
+                gap = lines[gap_start - 1:number - 1]
+                if any(line.strip() for line in gap):
+                    out.append(self._gap_marker(parsed["symbols"], gap_start, number - 1))
+                else:
+                    out.extend(gap)  # blank lines aren't worth a marker
+                gap_start = None
+            if number <= len(lines):
+                out.append(lines[number - 1])
+        return "\n".join(out) + "\n"
+
+    @staticmethod
+    def _gap_marker(symbols: List[Dict], start: int, end: int) -> str:
+        hidden = [s["signature"] for s in symbols if start <= s["start"] <= end and not s["parent"]]
+        hidden += [s["signature"] for s in symbols if start <= s["start"] <= end and s["parent"]]
+        summary = f": {'; '.join(hidden[:8])}{' ...' if len(hidden) > 8 else ''}" if hidden else ""
+        return f"... [lines {start}-{end} omitted{summary}] ..."
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"files": len(self._files)}
+
+
+_index: Optional[SymbolIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> SymbolIndex:
+    """Return the process-wide symbol index."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SymbolIndex()
+    return _index
+
+
+@file_watcher.on_change
+def _file_changed(path: str, deleted: bool):
+    """Drop a changed file's symbols; they are re-parsed on next use."""
+    if _index is not None:
+        _index.invalidate(path)
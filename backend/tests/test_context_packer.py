@@ -0,0 +1,78 @@
+"""
+Tests for token-budgeted prompt packing.
+
+Run from the repository root with ``python -m unittest discover backend/tests``
+(or ``python -m pytest backend/tests``).
+"""
+
+import os
+import unittest
+
+# config refuses to import without an API key; packing never calls the API
+os.environ.setdefault("CLAUDE_API_KEY", "test")
+
+from backend.context_packer import ContextBlock, ContextPacker  # noqa: E402
+
+
+def block(kind, name, tokens, relevance=0.0, truncatable=True):
+    """A block whose text estimates to about ``tokens`` tokens."""
+    text = "".join(f"{name} line {i:06d} .......\n" for i in range(tokens * 4 // 28 + 1))
+    return ContextBlock(kind, name, text, relevance=relevance, truncatable=truncatable)
+
+
+class PackPriorityTest(unittest.TestCase):
+
+    def test_large_top_priority_file_is_not_crowded_out_by_small_blocks(self):
+        big_file = block("file", "main.py", 5000, relevance=1.0)
+        small = [
+            block("blueprint", "blueprint", 300),
+            block("history", "turn-1", 300),
+            block("finding", "finding-1", 300, relevance=0.5),
+            block("finding", "finding-2", 300, relevance=0.2),
+        ]
+
+        packed = ContextPacker(budget=2000).pack(small + [big_file])
+
+        self.assertIn(big_file, packed["blocks"])
+        self.assertTrue(big_file.truncated)
+        self.assertEqual([entry["name"] for entry in packed["truncated"]], ["main.py"])
+        # Everything ranked below the truncated file is dropped, not kept whole
+        self.assertEqual(packed["blocks"], [big_file])
+        self.assertEqual({entry["name"] for entry in packed["dropped"]},
+                         {"blueprint", "turn-1", "finding-1", "finding-2"})
+        self.assertLessEqual(packed["used_tokens"], 2000)
+
+    def test_no_lower_ranked_block_stays_whole_after_a_truncation(self):
+        blocks = [
+            block("file", "a.py", 800, relevance=0.9),
+            block("file", "b.py", 1500, relevance=0.5),
+            block("finding", "finding-1", 50),
+        ]
+
+        packed = ContextPacker(budget=1500).pack(blocks)
+
+        self.assertFalse(blocks[0].truncated)
+        self.assertTrue(blocks[1].truncated)
+        self.assertNotIn(blocks[2], packed["blocks"])
+
+    def test_blocks_that_fit_are_kept_whole_in_original_order(self):
+        blocks = [block("finding", "finding-1", 100), block("file", "a.py", 300)]
+
+        packed = ContextPacker(budget=1000).pack(blocks)
+
+        self.assertEqual(packed["blocks"], blocks)
+        self.assertEqual(packed["truncated"], [])
+        self.assertEqual(packed["dropped"], [])
+
+    def test_oversized_untruncatable_block_leaves_room_for_smaller_ones(self):
+        history = block("history", "turn-1", 3000, truncatable=False)
+        finding = block("finding", "finding-1", 200)
+
+        packed = ContextPacker(budget=1000).pack([history, finding])
+
+        self.assertEqual(packed["blocks"], [finding])
+        self.assertEqual([entry["name"] for entry in packed["dropped"]], ["turn-1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+"""
+Rough token estimates for prompt budgeting.
+
+Claude's tokenizer isn't available offline, so these use the usual
+~4 characters per token rule of thumb. Good enough to decide when a
+history needs compacting or a prompt needs trimming; not for billing.
+"""
+
+from typing import Dict, List, Union
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a string."""
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _content_text(content: Union[str, List[Dict]]) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+def estimate_message_tokens(messages: List[Dict]) -> int:
+    """Approximate token count of a list of chat messages."""
+    # A few tokens of per-message framing (role markers)
+    return sum(estimate_tokens(_content_text(message["content"])) + 4 for message in messages)
@@ -0,0 +1,281 @@
+"""
+Project tree walker shared by every scanner.
+
+Prunes directories before descending into them: hidden ones, a caller's
+skip list, and anything matched by .gitignore/.agentignore files (nested
+ones apply below their own directory, as in git). Each ignore file is
+compiled to regexes once and recompiled only when it changes. In a git
+checkout the walker can instead list files with ``git ls-files``.
+
+No package-relative imports, so standalone scripts (extras/agent.py) can
+import it next to config.
+"""
+
+import os
+import re
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+IGNORE_FILES = (".gitignore", ".agentignore")
+
+
+class IgnoreRule:
+    """One compiled gitignore pattern."""
+
+    def __init__(self, pattern: str, regex, negate: bool, dir_only: bool):
+        self.pattern = pattern
+        self.regex = regex
+        self.negate = negate
+        self.dir_only = dir_only
+
+
+def _translate(glob: str) -> str:
+    """Regex body for a gitignore glob (``**``, ``*``, ``?``, ``[...]``)."""
+    out = []
+    i = 0
+    while i < len(glob):
+        if glob.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif glob.startswith("/**", i) and i + 3 == len(glob):
+            out.append("/.*")
+            i += 3
+        elif glob.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif glob[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif glob[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif glob[i] == "[":
+            end = glob.find("]", i + 2)
+            if end == -1:
+                out.append(re.escape("["))
+                i += 1
+                continue
+            body = glob[i + 1:end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            out.append(f"[{body.replace(chr(92), chr(92) * 2)}]")
+            i = end + 1
+        elif glob[i] == "\\" and i + 1 < len(glob):
+            out.append(re.escape(glob[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(glob[i]))
+            i += 1
+    return "".join(out)
+
+
+def compile_pattern(line: str) -> Optional[IgnoreRule]:
+    """Compile one line of an ignore file; None for blanks and comments."""
+    pattern = line.rstrip("\n").rstrip()
+    if not pattern or pattern.startswith("#"):
+        return None
+    negate = pattern.startswith("!")
+    if negate:
+        pattern = pattern[1:]
+    elif pattern.startswith("\\"):
+        pattern = pattern[1:]  # \# and \! escape a literal first character
+    dir_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    if not pattern:
+        return None
+
+    # A slash anywhere but the end anchors the pattern to the ignore file's directory
+    anchored = "/" in pattern
+    body = _translate(pattern.lstrip("/"))
+    regex = re.compile(("^" if anchored else "^(?:.*/)?") + body + "$")
+    return IgnoreRule(line.strip(), regex, negate, dir_only)
+
+
+_compiled: Dict[str, Tuple[int, List[IgnoreRule]]] = {}  # ignore file -> (mtime_ns, rules)
+_compiled_lock = threading.Lock()
+
+
+def load_ignore_file(path: str) -> List[IgnoreRule]:
+    """Compiled rules of an ignore file (cached until the file changes); [] if it doesn't exist."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return []
+    with _compiled_lock:
+        cached = _compiled.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            rules = [rule for rule in map(compile_pattern, f) if rule is not None]
+    except OSError:
+        return []
+    with _compiled_lock:
+        _compiled[path] = (mtime, rules)
+    return rules
+
+
+# (directory relative to root, its rules), outermost first
+RuleChain = List[Tuple[str, List[IgnoreRule]]]
+
+
+class Walker:
+    """Lists a project's files, pruning skipped and ignored directories before descending."""
+
+    def __init__(
+        self,
+        root,
+        extensions: Optional[Iterable[str]] = None,
+        skip_dirs: Iterable[str] = (),
+        skip_hidden: bool = True,
+        ignore_files: Iterable[str] = IGNORE_FILES,
+        use_git: bool = False
+    ):
+        self.root = Path(root)
+        self.extensions = set(extensions) if extensions is not None else None
+        self.skip_dirs = set(skip_dirs)
+        self.skip_hidden = skip_hidden
+        self.ignore_files = tuple(ignore_files)
+        self.use_git = use_git
+
+    def files(self, start: str = "") -> Dict[str, os.stat_result]:
+        """Relative path -> stat of every file kept under ``start`` (a directory relative to root)."""
+        if self.use_git and not start:
+            listed = self._git_files()
+            if listed is not None:
+                return listed
+        found = {}
+        for directory, chain, entries in self._scan(start):
+            for entry in entries:
+                path = f"{directory}/{entry.name}" if directory else entry.name
+                try:
+                    if entry.is_file() and self._keep_file(entry.name) and not self._matches(chain, path, False):
+                        found[path] = entry.stat()
+                except OSError:
+                    continue
+        return found
+
+    def directories(self, start: str = "") -> List[str]:
+        """``start`` and every directory below it that the walker would descend into."""
+        return [directory for directory, _, _ in self._scan(start)]
+
+    def ignored(self, path: str, is_dir: bool = False) -> bool:
+        """Whether a path (relative to root) is skipped, itself or through an ancestor directory."""
+        parts = path.split("/")
+        if not is_dir and not self._keep_file(parts[-1]):
+            return True
+        chain = self._chain_for("")
+        for depth in range(1, len(parts) + 1):
+            current = "/".join(parts[:depth])
+            current_is_dir = is_dir or depth < len(parts)
+            if current_is_dir and self._skip_dir(parts[depth - 1]):
+                return True
+            if self._matches(chain, current, current_is_dir):
+                return True
+            if current_is_dir:
+                chain = chain + self._rules_in(current)
+        return False
+
+    def is_ignore_file(self, path: str) -> bool:
+        """Whether a path is one of the ignore files (a change to it reshapes the tree)."""
+        return path.rsplit("/", 1)[-1] in self.ignore_files
+
+    def _skip_dir(self, name: str) -> bool:
+        return name in self.skip_dirs or (self.skip_hidden and name.startswith("."))
+
+    def _keep_file(self, name: str) -> bool:
+        if self.skip_hidden and name.startswith("."):
+            return False
+        return self.extensions is None or os.path.splitext(name)[1] in self.extensions
+
+    def _rules_in(self, directory: str) -> RuleChain:
+        base = self.root / directory if directory else self.root
+        rules = []
+        for name in self.ignore_files:
+            rules.extend(load_ignore_file(str(base / name)))
+        return [(directory, rules)] if rules else []
+
+    def _chain_for(self, directory: str) -> RuleChain:
+        """Rules that apply inside ``directory``: its own and every ancestor's."""
+        chain = self._rules_in("")
+        if directory:
+            parts = directory.split("/")
+            for depth in range(1, len(parts) + 1):
+                chain += self._rules_in("/".join(parts[:depth]))
+        return chain
+
+    @staticmethod
+    def _matches(chain: RuleChain, path: str, is_dir: bool) -> bool:
+        """gitignore semantics: the last matching rule wins; ``!`` re-includes."""
+        ignored = False
+        for base, rules in chain:
+            if base:
+                if not path.startswith(base + "/"):
+                    continue
+                relative = path[len(base) + 1:]
+            else:
+                relative = path
+            for rule in rules:
+                if rule.dir_only and not is_dir:
+                    continue
+                if rule.regex.match(relative):
+                    ignored = not rule.negate
+        return ignored
+
+    def _scan(self, start: str):
+        """Yield (directory, rule chain, entries) for each directory kept, depth first."""
+        start = start.strip("/")
+        stack = [(start, self._chain_for(start))]
+        while stack:
+            directory, chain = stack.pop()
+            try:
+                with os.scandir(self.root / directory if directory else self.root) as iterator:
+                    entries = list(iterator)
+            except OSError:
+                continue
+            yield directory, chain, entries
+            for entry in entries:
+                try:
+                    if not entry.is_dir(follow_symlinks=False) or self._skip_dir(entry.name):
+                        continue
+                except OSError:
+                    continue
+                path = f"{directory}/{entry.name}" if directory else entry.name
+                if not self._matches(chain, path, True):
+                    stack.append((path, chain + self._rules_in(path)))
+
+    def _git_files(self) -> Optional[Dict[str, os.stat_result]]:
+        """Files from ``git ls-files`` (tracked plus untracked, not ignored); None if not a git checkout."""
+        if not (self.root / ".git").exists():
+            return None
+        try:
+            result = subprocess.run(
+                ["git", "-C", str(self.root), "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+                capture_output=True, timeout=10
+            )
+        except (OSError, subprocess.SubprocessError):
+            return None
+        if result.returncode != 0:
+            return None
+
+        found = {}
+        chains: Dict[str, Optional[RuleChain]] = {}  # directory -> its rules, None if pruned
+        for raw in result.stdout.split(b"\0"):
+            path = os.fsdecode(raw)
+            if not path or path in found:
+                continue
+            directory, _, name = path.rpartition("/")
+            if directory not in chains:
+                pruned = bool(directory) and self.ignored(directory, is_dir=True)
+                chains[directory] = None if pruned else self._chain_for(directory)
+            # git already applied .gitignore; this adds the skip list and .agentignore
+            chain = chains[directory]
+            if chain is None or not self._keep_file(name) or self._matches(chain, path, False):
+                continue
+            try:
+                found[path] = os.stat(self.root / path)
+            except OSError:
+                continue  # tracked but deleted from the working tree
+        return found
@@ -33,6 +33,7 @@ from config import (
     SYSTEM_PROMPT,
     validate_target_path
 )
+from walker import Walker
 
 
 class CrossDirectoryAgent:
@@ -275,33 +276,30 @@ Return the improved content:"""
         # files to ignore
         IGNORE_DIRS = {'.git', '.venv', 'venv', 'env', '__pycache__', 'node_modules', 'dist', 'build', 'coverage'}
         
-        for root, dirs, files in os.walk(target_dir):
-            # Modify dirs in-place to skip ignored directories
-            dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
+        # The walker prunes IGNORE_DIRS and .gitignore/.agentignore matches before descending
+        walker = Walker(TARGET_PROJECT_DIR, ALLOWED_EXTENSIONS, IGNORE_DIRS, skip_hidden=False)
+        start = os.path.normpath(relative_path).replace(os.sep, "/")
+        if start == ".":
+            start = ""
+        
+        for rel_file_path, stat in sorted(walker.files(start).items()):
+            file_path = TARGET_PROJECT_DIR / rel_file_path
             
-            for file in files:
-                file_path = Path(root) / file
-                rel_file_path = file_path.relative_to(TARGET_PROJECT_DIR)
-                
-                # Check extension
-                if file_path.suffix not in ALLOWED_EXTENSIONS:
-                    continue
-                    
-                # Check size
-                if file_path.stat().st_size > MAX_FILE_SIZE:
-                    print(f"[SKIP] File too large: {rel_file_path}")
-                    continue
-                
-                # Check if file is safe (using existing validation logic if possible, 
-                # but here we are confident it is within target_dir because of os.walk)
-                
-                try:
-                    content = file_path.read_text(encoding="utf-8")
-                    aggregated_content.append(f"File: {rel_file_path}\n---\n{content}\n---\n")
-                    file_count += 1
-                    print(f"[Found] {rel_file_path}")
-                except Exception as e:
-                    print(f"[ERROR] Could not read {rel_file_path}: {e}")
+            # Check size
+            if stat.st_size > MAX_FILE_SIZE:
+                print(f"[SKIP] File too large: {rel_file_path}")
+                continue
+            
+            # Check if file is safe (using existing validation logic if possible, 
+            # but here we are confident it is within target_dir because of the walker)
+            
+            try:
+                content = file_path.read_text(encoding="utf-8")
+                aggregated_content.append(f"File: {rel_file_path}\n---\n{content}\n---\n")
+                file_count += 1
+                print(f"[Found] {rel_file_path}")
+            except Exception as e:
+                print(f"[ERROR] Could not read {rel_file_path}: {e}")
         
         if not aggregated_content:
             print("[ERROR] No valid files found to analyze.")
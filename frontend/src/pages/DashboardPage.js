@@ -6,8 +6,13 @@ import TicketForm from '../components/TicketForm';
 import api from '../services/api';
 import './DashboardPage.css';
 
+const PAGE_SIZE = 50;
+
 const DashboardPage = () => {
   const [tickets, setTickets] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [summary, setSummary] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [showForm, setShowForm] = useState(false);
@@ -24,13 +29,24 @@ const DashboardPage = () => {
 
   useEffect(() => {
     loadTickets();
-  }, []);
+  }, [activeCategory]);
+
+  // The category filter runs on the server, so each tab pages through its own tickets
+  const fetchPage = (cursor) => api.getTickets(null, null, cursor, {
+    category: activeCategory === 'all' ? null : activeCategory,
+    limit: PAGE_SIZE,
+  });
 
   const loadTickets = async () => {
     setLoading(true);
     try {
-      const response = await api.getTickets();
+      const [response, summaryResponse] = await Promise.all([
+        fetchPage(null),
+        api.getDashboardSummary(),
+      ]);
       setTickets(response.tickets || []);
+      setNextCursor(response.next_cursor || null);
+      setSummary(summaryResponse.tickets || null);
     } catch (err) {
       setError('Failed to load tickets');
       console.error(err);
@@ -39,6 +55,20 @@ const DashboardPage = () => {
     }
   };
 
+  const loadMoreTickets = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await fetchPage(nextCursor);
+      setTickets(prev => [...prev, ...(response.tickets || [])]);
+      setNextCursor(response.next_cursor || null);
+    } catch (err) {
+      console.error('Failed to load more tickets:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleCreateTicket = async (ticketData) => {
     try {
       await api.createTicket(ticketData);
@@ -49,10 +79,6 @@ const DashboardPage = () => {
     }
   };
 
-  const filteredTickets = activeCategory === 'all'
-    ? tickets
-    : tickets.filter(t => t.category === activeCategory);
-
   const handleTicketClick = (ticketId) => {
     navigate(`/ticket/${ticketId}`);
   };
@@ -77,10 +103,8 @@ const DashboardPage = () => {
               onClick={() => setActiveCategory(cat.key)}
             >
               {cat.label}
-              {cat.key !== 'all' && (
-                <span className="count">
-                  {tickets.filter(t => t.category === cat.key).length}
-                </span>
+              {cat.key !== 'all' && summary && (
+                <span className="count">{summary.by_category[cat.key] || 0}</span>
               )}
             </button>
           ))}
@@ -90,21 +114,30 @@ const DashboardPage = () => {
           <div className="loading">Loading tickets...</div>
         ) : error ? (
           <div className="error">{error}</div>
-        ) : filteredTickets.length === 0 ? (
+        ) : tickets.length === 0 ? (
           <div className="empty-state">
             <p>No tickets found</p>
             <button onClick={() => setShowForm(true)}>Create your first ticket</button>
           </div>
         ) : (
-          <div className="tickets-grid">
-            {filteredTickets.map(ticket => (
-              <TicketCard
-                key={ticket.id}
-                ticket={ticket}
-                onClick={() => handleTicketClick(ticket.id)}
-              />
-            ))}
-          </div>
+          <>
+            <div className="tickets-grid">
+              {tickets.map(ticket => (
+                <TicketCard
+                  key={ticket.id}
+                  ticket={ticket}
+                  onClick={() => handleTicketClick(ticket.id)}
+                />
+              ))}
+            </div>
+            {nextCursor && (
+              <div className="load-more">
+                <button onClick={loadMoreTickets} disabled={loadingMore}>
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </button>
+              </div>
+            )}
+          </>
         )}
       </main>
 
@@ -4,6 +4,13 @@ import Navigation from '../components/Navigation';
 import api from '../services/api';
 import './TicketDetailPage.css';
 
+const diffLineClass = (line) => {
+  if (line.startsWith('@@')) return 'hunk';
+  if (line.startsWith('+') && !line.startsWith('+++')) return 'added';
+  if (line.startsWith('-') && !line.startsWith('---')) return 'removed';
+  return '';
+};
+
 const TicketDetailPage = () => {
   const { id } = useParams();
   const navigate = useNavigate();
@@ -90,11 +97,24 @@ const TicketDetailPage = () => {
     setChatLoading(true);
 
     try {
-      const response = await api.ticketChat(id, userMessage);
-      setChatMessages(prev => [...prev, {
-        role: 'assistant',
-        content: response.response
-      }]);
+      // Stream the reply: the first delta opens the assistant message, later ones extend it
+      let started = false;
+      await api.streamTicketChat(id, userMessage, (type, data) => {
+        if (type === 'delta' && !started) {
+          started = true;
+          setChatMessages(prev => [...prev, { role: 'assistant', content: data.text }]);
+        } else if (type === 'delta') {
+          setChatMessages(prev => {
+            const last = prev[prev.length - 1];
+            return [...prev.slice(0, -1), { ...last, content: last.content + data.text }];
+          });
+        } else if (type === 'error') {
+          setChatMessages(prev => [...prev, {
+            role: 'assistant',
+            content: `Error: ${data.error}`
+          }]);
+        }
+      });
     } catch (err) {
       console.error('Chat failed:', err);
     } finally {
@@ -391,14 +411,16 @@ const TicketDetailPage = () => {
                     </div>
                   )}
                   {selectedChange === change.id && (
-                    <div className="diff-view">
+                    <div className="diff-view unified">
                       <div className="diff-panel">
-                        <h4>Original</h4>
-                        <pre>{change.original_content}</pre>
-                      </div>
-                      <div className="diff-panel proposed">
-                        <h4>Proposed</h4>
-                        <pre>{change.proposed_content}</pre>
+                        <h4>
+                          Diff (+{change.lines_added || 0} / -{change.lines_removed || 0})
+                        </h4>
+                        <pre>
+                          {(change.diff || '').split('\n').map((line, i) => (
+                            <div key={i} className={`diff-line ${diffLineClass(line)}`}>{line}</div>
+                          ))}
+                        </pre>
                       </div>
                     </div>
                   )}
@@ -417,7 +439,7 @@ const TicketDetailPage = () => {
                   <div className="message-content">{msg.content}</div>
                 </div>
               ))}
-              {chatLoading && (
+              {chatLoading && chatMessages[chatMessages.length - 1]?.role === 'user' && (
                 <div className="chat-message assistant">
                   <div className="message-content typing">Thinking...</div>
                 </div>
@@ -8,6 +8,43 @@ const fetchWithCredentials = async (url, options = {}) => {
   return response.json();
 };
 
+// POST a JSON body to a Server-Sent Events endpoint and call onEvent(type, data)
+// for every event as it arrives. Resolves once the stream ends.
+const streamEvents = async (url, body, onEvent) => {
+  const response = await fetch(url, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(body),
+    credentials: 'include',
+  });
+  if (!response.ok || !response.body) {
+    onEvent('error', await response.json());
+    return;
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let type = 'message';
+      let data = '';
+      raw.split('\n').forEach((line) => {
+        if (line.startsWith('event: ')) type = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      });
+      if (data) onEvent(type, JSON.parse(data));
+    }
+  }
+};
+
 const api = {
   // Authentication
   async login(username, password) {
@@ -65,6 +102,10 @@ const api = {
     return response.json();
   },
 
+  async streamChat(message, onEvent) {
+    return streamEvents(`${API_BASE}/chat/stream`, { message }, onEvent);
+  },
+
   async clearHistory() {
     const response = await fetch(`${API_BASE}/history/clear`, {
       method: 'POST',
@@ -81,6 +122,10 @@ const api = {
     return response.json();
   },
 
+  async streamTask(task, onEvent) {
+    return streamEvents(`${API_BASE}/task/stream`, { task }, onEvent);
+  },
+
   // Users
   async getUsers() {
     const response = await fetch(`${API_BASE}/users`);
@@ -112,14 +157,23 @@ const api = {
   },
 
   // Tickets
-  async getTickets(projectId, status) {
+  // Returns one page ({ tickets, next_cursor }); pass next_cursor back for the next one
+  async getTickets(projectId, status, cursor, { category, limit = 50 } = {}) {
     const params = new URLSearchParams();
     if (projectId) params.append('project_id', projectId);
     if (status) params.append('status', status);
+    if (category) params.append('category', category);
+    params.append('limit', limit);
+    if (cursor) params.append('cursor', cursor);
     const response = await fetch(`${API_BASE}/tickets?${params}`);
     return response.json();
   },
 
+  async getDashboardSummary() {
+    const response = await fetch(`${API_BASE}/dashboard/summary`);
+    return response.json();
+  },
+
   async createTicket(ticketData) {
     const response = await fetch(`${API_BASE}/tickets`, {
       method: 'POST',
@@ -169,6 +223,10 @@ const api = {
     return response.json();
   },
 
+  async streamTicketChat(ticketId, message, onEvent) {
+    return streamEvents(`${API_BASE}/tickets/${ticketId}/chat/stream`, { message }, onEvent);
+  },
+
   // Proposed Changes
   async getProposedChanges() {
     const response = await fetch(`${API_BASE}/proposed-changes`);
@@ -209,19 +267,32 @@ const api = {
   },
 
   // Changes History
-  async getChanges(projectId, limit = 50) {
+  async getChanges(projectId, limit = 50, cursor) {
     const params = new URLSearchParams();
     if (projectId) params.append('project_id', projectId);
     params.append('limit', limit);
+    if (cursor) params.append('cursor', cursor);
     const response = await fetch(`${API_BASE}/changes?${params}`);
     return response.json();
   },
 
+  // Search
+  async search(query, type, offset = 0) {
+    const params = new URLSearchParams({ q: query, offset });
+    if (type) params.append('type', type);
+    const response = await fetch(`${API_BASE}/search?${params}`);
+    return response.json();
+  },
+
   // AI Context
-  async getContext(projectId, type) {
+  // Returns one page ({ context, next_cursor }); pass next_cursor back for the next one
+  async getContext(projectId, type, cursor, { tag, limit = 50 } = {}) {
     const params = new URLSearchParams();
     if (projectId) params.append('project_id', projectId);
     if (type) params.append('type', type);
+    if (tag) params.append('tag', tag);
+    params.append('limit', limit);
+    if (cursor) params.append('cursor', cursor);
     const response = await fetch(`${API_BASE}/context?${params}`);
     return response.json();
   },